@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# Write a file atomically: write a temporary file in the same folder, then rename it to the file
+#
+# The temporary file is made by tempfile.mkstemp, so the threads and the processes writing
+# the same file never share a temporary file, the last rename wins.
+
+import os
+import tempfile
+
+
+def write_file_atomically(file_path, write_function, binary=False):
+    """Call write_function(f) with the temporary file, then replace file_path with it. Raise OSError if failed"""
+    dir_name = os.path.dirname(file_path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    fd, temp_file_path = tempfile.mkstemp(dir=dir_name or None, prefix=f'{os.path.basename(file_path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write_function(f)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_file_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# Benchmark of the Podfile.lock parsers on the synthetic Podfile.lock files
+#
+# Compare the single-pass parser (parse_podfile_lock_file) with the section by section one
+# (parse_podfile_lock_file_by_sections): the parse time in milliseconds, and the peak memory
+# of the parse measured by tracemalloc. The results of both parsers must be the same.
+#
+# Usage:
+# $ python3 benchmark/benchmark_podfile_lock_parser.py
+# $ python3 benchmark/benchmark_podfile_lock_parser.py -s 10000 50000 -r 10
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import benchmark_show_source_code
+import parse_podfile_lock_file
+
+PARSER_DICT = {
+    'by_sections': parse_podfile_lock_file.parse_podfile_lock_file_by_sections,
+    'single_pass': parse_podfile_lock_file.parse_podfile_lock_file,
+}
+
+
+def measure_parser(name, parser, podfile_lock_file_path, repeat):
+    """Return the record with keys: parser、min_ms、median_ms、peak_kb"""
+    seconds_list = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        parser(podfile_lock_file_path)
+        seconds_list.append(time.perf_counter() - start_time)
+
+    # Note: tracemalloc slows down the parse, measure the memory in a separate run
+    tracemalloc.start()
+    parser(podfile_lock_file_path)
+    _, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'parser': name,
+        'min_ms': min(seconds_list) * 1000,
+        'median_ms': statistics.median(seconds_list) * 1000,
+        'peak_kb': peak_size / 1024,
+    }
+
+
+def run_command_parser():
+    my_parser = argparse.ArgumentParser(description='Benchmark the Podfile.lock parsers on the synthetic Podfile.lock files')
+    my_parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1000, 10000], help='The pod counts of the Podfile.lock files')
+    my_parser.add_argument('-r', '--repeat', type=int, default=5, help='Parse every file N times')
+    args = my_parser.parse_args()
+    return args
+
+
+def main():
+    args = run_command_parser()
+    print(f'{"file":<24} {"parser":<12} {"min ms":>10} {"median ms":>10} {"peak KB":>10}')
+    for pod_count in args.sizes:
+        podfile_lock_file_path = os.path.join(benchmark_show_source_code.BENCH_DIR, 'lockfiles', f'Podfile-{pod_count}.lock')
+        benchmark_show_source_code.make_podfile_lock(podfile_lock_file_path, pod_count)
+        file_name = f'{pod_count} pods, {os.path.getsize(podfile_lock_file_path) // 1024} KB'
+
+        results = [x(podfile_lock_file_path) for x in PARSER_DICT.values()]
+        if any(x != results[0] for x in results):
+            print(f'[Error] the parsers have different results of {podfile_lock_file_path}')
+            return 1
+
+        for name, parser in PARSER_DICT.items():
+            record = measure_parser(name, parser, podfile_lock_file_path, args.repeat)
+            print(f'{file_name:<24} {name:<12} {record["min_ms"]:10.2f} {record["median_ms"]:10.2f} {record["peak_kb"]:10.1f}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# Benchmark of the show_source_code pipeline against local fixtures
+#
+# The fixtures are made in /tmp/show_source_code_bench, nothing goes to the network,
+# the real /tmp/show_source_code or /tmp/lldb_scripts:
+# - a fake lldb module, see fake_lldb.py
+# - the synthetic Podfile.lock files with 1k-10k pods, and a DerivedData info.plist
+# - the local podspec server, see podspec_stand_in_server.py
+# - the local bare git repositories of the pods
+#
+# Every stage runs several times and reports min/median/max in milliseconds. The result is
+# appended to the history file with the git commit, `--compare` checks the min of every
+# stage against the last record with the same workload arguments and exits 1 if some stage is
+# slower than the threshold.
+# Note: the min is compared, it's less noisy than the median for a few runs
+#
+# Usage:
+# $ python3 benchmark/benchmark_show_source_code.py
+# $ python3 benchmark/benchmark_show_source_code.py -s 1000 10000 -p 20 -r 5 --compare
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import plistlib
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+import fake_lldb
+fake_lldb.install()
+
+import lldb_command_show_source_code as show_source_code
+import parse_podfile_lock_file
+import podspec_stand_in_server
+import source_map_store
+
+BENCH_DIR = '/tmp/show_source_code_bench'
+# Note: show_source_code takes the first 8 path components of the executable path as the DerivedData folder
+DERIVED_DATA_DIR = os.path.join(BENCH_DIR, 'Library', 'Developer', 'Xcode', 'DerivedData', 'App-bench')
+BUILD_ROOT = '/Users/builder/build/BenchPods'
+SENTINEL = 'BenchPods'
+POD_VERSION = '1.0.0'
+HISTORY_FILE_PATH = os.path.join(BENCH_DIR, 'history.jsonl')
+# Note: the arguments which change the workload, only the results of the same ones are compared
+WORKLOAD_ARG_NAMES = ['sizes', 'pods', 'files', 'frames', 'map_entries', 'latency', 'sparse']
+# Note: the parsed Podfile.lock cache, instead of /tmp/lldb_scripts
+PODFILE_LOCK_CACHE_DIR = os.path.join(BENCH_DIR, 'lldb_scripts')
+
+
+def make_podfile_lock(file_path, pod_count):
+    """Write a Podfile.lock with pod_count pods, every tenth pod has a subspec and a dependency"""
+    pods_lines = []
+    dependencies_lines = []
+    checksums_lines = []
+    for index in range(pod_count):
+        pod_name = tool_get_pod_name(index)
+        if index % 10 == 0 and index > 0:
+            pods_lines.append(f'  - {pod_name} ({POD_VERSION}):')
+            pods_lines.append(f'    - {pod_name}/Core (= {POD_VERSION})')
+            pods_lines.append(f'    - {tool_get_pod_name(index - 1)}')
+            pods_lines.append(f'  - {pod_name}/Core ({POD_VERSION})')
+        else:
+            pods_lines.append(f'  - {pod_name} ({POD_VERSION})')
+        dependencies_lines.append(f'  - {pod_name} (~> {POD_VERSION})')
+        checksums_lines.append(f'  {pod_name}: {index:040x}')
+
+    content = '\n'.join([
+        'PODS:', *pods_lines, '',
+        'DEPENDENCIES:', *dependencies_lines, '',
+        'SPEC REPOS:', '  trunk:', *[f'    - {tool_get_pod_name(x)}' for x in range(pod_count)], '',
+        'SPEC CHECKSUMS:', *checksums_lines, '',
+        'PODFILE CHECKSUM: 1b4f5c2b6d8a9e2f3c4d5e6f7a8b9c0d1e2f3a4b', '',
+        'COCOAPODS: 1.11.3', '',
+    ])
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as f:
+        f.write(content)
+
+
+def make_derived_data(workspace_dir):
+    """Write the DerivedData info.plist which points to the workspace. Return the executable folder"""
+    os.makedirs(DERIVED_DATA_DIR, exist_ok=True)
+    with open(os.path.join(DERIVED_DATA_DIR, 'info.plist'), 'wb') as f:
+        plistlib.dump({'WorkspacePath': os.path.join(workspace_dir, 'App.xcworkspace')}, f, fmt=plistlib.FMT_BINARY)
+
+    executable_path = os.path.join(DERIVED_DATA_DIR, 'Build', 'Products', 'Debug-iphonesimulator')
+    os.makedirs(executable_path, exist_ok=True)
+    return executable_path
+
+
+def make_git_repos(repo_dir, pod_names, file_count):
+    """Make a bare git repository for every pod. Return a dictionary of podspec key -> podspec"""
+    podspec_dict = {}
+    for pod_name in pod_names:
+        work_dir = os.path.join(repo_dir, 'work', pod_name)
+        bare_dir = os.path.join(repo_dir, f'{pod_name}.git')
+        if not os.path.isdir(bare_dir):
+            os.makedirs(os.path.join(work_dir, pod_name, 'Classes'), exist_ok=True)
+            for index in range(file_count):
+                with open(os.path.join(work_dir, pod_name, 'Classes', f'File{index}.m'), 'w') as f:
+                    f.write(f'// {pod_name} File{index}\n' * 50)
+            tool_run_git(['init', '-q'], work_dir)
+            tool_run_git(['add', '.'], work_dir)
+            tool_run_git(['-c', 'user.name=bench', '-c', 'user.email=bench@localhost', 'commit', '-q', '-m', 'init'], work_dir)
+            tool_run_git(['clone', '-q', '--bare', work_dir, bare_dir], repo_dir)
+            # Note: show_source_code fetches the commit by its SHA
+            tool_run_git(['config', 'uploadpack.allowAnySHA1InWant', 'true'], bare_dir)
+            tool_run_git(['config', 'uploadpack.allowFilter', 'true'], bare_dir)
+
+        commit = tool_run_git(['rev-parse', 'HEAD'], bare_dir)
+        podspec_dict[f'{pod_name}/{POD_VERSION}'] = {
+            'name': pod_name,
+            'version': POD_VERSION,
+            'source': {
+                'git': f'file://{bare_dir}',
+                'commit': commit,
+            },
+        }
+
+    return podspec_dict
+
+
+def setup_sandbox(server_url, sparse):
+    """Point show_source_code to the fixtures"""
+    source_code_dir = os.path.join(BENCH_DIR, 'show_source_code')
+    show_source_code.SOURCE_CODE_DIR = source_code_dir
+    show_source_code.GIT_CACHE_DIR = os.path.join(source_code_dir, '.git_cache')
+    show_source_code.GIT_CACHE_INDEX_FILE_PATH = os.path.join(show_source_code.GIT_CACHE_DIR, 'index.json')
+    show_source_code.PODSPEC_INDEX_FILE_PATH = os.path.join(source_code_dir, 'podspec_index.json')
+    show_source_code._show_source_code_env = {
+        'pod_name_sentinel': SENTINEL,
+        'podspec_query_api': server_url,
+        'git_url_keypath': 'source.git',
+        'git_commit_keypath': 'source.commit',
+        'sparse_checkout': 'true' if sparse else 'false',
+    }
+    os.makedirs(source_code_dir, exist_ok=True)
+    show_source_code._show_source_code_source_map_store = source_map_store.SourceMapStore(
+        os.path.join(source_code_dir, 'source_map.db'), None)
+
+
+def reset_downloads():
+    """Remove the checkouts, the git cache and the podspec cache, keep the fixtures"""
+    shutil.rmtree(show_source_code.SOURCE_CODE_DIR, ignore_errors=True)
+    os.makedirs(show_source_code.SOURCE_CODE_DIR, exist_ok=True)
+    reset_podspec_memory()
+    show_source_code._show_source_code_source_map_store = source_map_store.SourceMapStore(
+        os.path.join(show_source_code.SOURCE_CODE_DIR, 'source_map.db'), None)
+    vars(show_source_code).pop('_show_source_code_path_resolver', None)
+    fake_lldb.debugger.source_map = []
+
+
+def reset_podspec_memory():
+    show_source_code.podspec_memory_cache.clear()
+
+
+def reset_pod_version_caches():
+    show_source_code.podfile_lock_cache.clear()
+    show_source_code.workspace_path_cache.clear()
+
+
+def measure(name, function, repeat, setup=None, verbose=False):
+    """Run the function repeat times. Return the record with keys: stage、min_ms、median_ms、max_ms"""
+    seconds_list = []
+    for _ in range(repeat):
+        setup() if setup else None
+        with tool_quiet(not verbose):
+            start_time = time.perf_counter()
+            function()
+            seconds_list.append(time.perf_counter() - start_time)
+
+    record = {
+        'stage': name,
+        'min_ms': min(seconds_list) * 1000,
+        'median_ms': statistics.median(seconds_list) * 1000,
+        'max_ms': max(seconds_list) * 1000,
+    }
+    print(f'{name:<48} {record["min_ms"]:10.2f} {record["median_ms"]:10.2f} {record["max_ms"]:10.2f}')
+    return record
+
+
+def run_benchmark(args):
+    records = []
+    print(f'{"stage (ms)":<48} {"min":>10} {"median":>10} {"max":>10}')
+
+    # Note: Podfile.lock parsing and the pod version lookup
+    parse_podfile_lock_file.CACHE_DIR = PODFILE_LOCK_CACHE_DIR
+    executable_path = None
+    for pod_count in args.sizes:
+        workspace_dir = os.path.join(BENCH_DIR, 'workspaces', f'pods-{pod_count}')
+        podfile_lock_file_path = os.path.join(workspace_dir, 'Podfile.lock')
+        make_podfile_lock(podfile_lock_file_path, pod_count)
+        executable_path = make_derived_data(workspace_dir)
+        pod_name = tool_get_pod_name(pod_count - 1)
+
+        def load_podfile_lock_cache():
+            reset_pod_version_caches()
+            parse_podfile_lock_file.load_podfile_lock_file(podfile_lock_file_path, [parse_podfile_lock_file.POD_VERSIONS])
+
+        records.append(measure(f'parse_podfile_lock[{pod_count}] cold',
+                               lambda: show_source_code.get_pod_version_dict(podfile_lock_file_path, use_cache=False),
+                               args.repeat, reset_pod_version_caches, args.verbose))
+        records.append(measure(f'parse_podfile_lock[{pod_count}] disk cache',
+                               lambda: show_source_code.get_pod_version_dict(podfile_lock_file_path),
+                               args.repeat, load_podfile_lock_cache, args.verbose))
+        records.append(measure(f'get_pod_version[{pod_count}] cold',
+                               lambda: show_source_code.get_pod_version(pod_name, executable_path),
+                               args.repeat, reset_pod_version_caches, args.verbose))
+        records.append(measure(f'get_pod_version[{pod_count}] warm',
+                               lambda: show_source_code.get_pod_version(pod_name, executable_path),
+                               args.repeat, None, args.verbose))
+
+    # Note: the following stages use the workspace with the largest Podfile.lock
+    pod_names = [tool_get_pod_name(x) for x in range(args.pods)]
+    podspec_dict = make_git_repos(os.path.join(BENCH_DIR, 'repos'), pod_names, args.files)
+    server = podspec_stand_in_server.start_stand_in_server(podspec_dict=podspec_dict, latency=args.latency / 1000)
+    setup_sandbox(server.url_template, args.sparse)
+    git_info = podspec_dict[f'{pod_names[0]}/{POD_VERSION}']['source']
+    source_paths = [f'{pod_names[0]}/Classes/File0.m']
+
+    records.append(measure('get_git_info_dict http',
+                           lambda: show_source_code.get_git_info_dict(pod_names[0], POD_VERSION),
+                           args.repeat, reset_downloads, args.verbose))
+    records.append(measure('get_git_info_dict disk',
+                           lambda: show_source_code.get_git_info_dict(pod_names[0], POD_VERSION),
+                           args.repeat, reset_podspec_memory, args.verbose))
+    records.append(measure('get_git_info_dict memory',
+                           lambda: show_source_code.get_git_info_dict(pod_names[0], POD_VERSION),
+                           args.repeat, None, args.verbose))
+
+    def download():
+        assert show_source_code.download_git_repo(git_info['git'], git_info['commit'], pod_names[0], POD_VERSION, source_paths)
+
+    def remove_checkout():
+        shutil.rmtree(os.path.join(show_source_code.SOURCE_CODE_DIR, pod_names[0]), ignore_errors=True)
+        cache_dir = show_source_code.get_git_cache_dir(git_info['git'])
+        subprocess.run(['git', '-C', cache_dir, 'worktree', 'prune'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    records.append(measure('download_git_repo cold', download, args.repeat, reset_downloads, args.verbose))
+    records.append(measure('download_git_repo git cache', download, args.repeat, remove_checkout, args.verbose))
+    records.append(measure('download_git_repo checked out', download, args.repeat, None, args.verbose))
+
+    # Note: the frames of `show_source_code -p`, every pod has several frames
+    source_file_path_list = [f'{BUILD_ROOT}/{x}/Classes/File{y}.m' for x in pod_names for y in range(args.frames)]
+    records.append(measure('target_source_map frame',
+                           lambda: show_source_code.target_source_map(f'Lines found in module: {source_file_path_list[0]}:12',
+                                                                      executable_path, fake_lldb.debugger),
+                           args.repeat, reset_downloads, args.verbose))
+    records.append(measure(f'target_source_map_batch[{args.pods} pods] cold',
+                           lambda: show_source_code.target_source_map_batch(source_file_path_list, executable_path, fake_lldb.debugger),
+                           args.repeat, reset_downloads, args.verbose))
+    # Note: warm is the pods checked out and the entries saved, but target.source-map cleared, e.g. a new target
+    records.append(measure(f'target_source_map_batch[{args.pods} pods] warm',
+                           lambda: show_source_code.target_source_map_batch(source_file_path_list, executable_path, fake_lldb.debugger),
+                           args.repeat, lambda: setattr(fake_lldb.debugger, 'source_map', []), args.verbose))
+
+    # Note: the existing target.source-map entries of a long debugging session
+    existing_source_map = [(f'/Users/builder/build/Old{x}', f'/tmp/old/Old{x}') for x in range(args.map_entries)]
+
+    def set_existing_source_map():
+        fake_lldb.debugger.source_map = list(existing_source_map)
+
+    records.append(measure(f'get_existing_map_dict[{args.map_entries}]',
+                           lambda: show_source_code.get_existing_map_dict(fake_lldb.debugger),
+                           args.repeat, set_existing_source_map, args.verbose))
+    records.append(measure(f'apply_source_map[{args.map_entries}]',
+                           lambda: show_source_code.apply_source_map({f'{BUILD_ROOT}/New': '/tmp/new'}, fake_lldb.debugger),
+                           args.repeat, set_existing_source_map, args.verbose))
+
+    server.shutdown()
+    server.server_close()
+    return records
+
+
+def compare_records(records, baseline_records, threshold, min_ms):
+    """Return the stages whose min is slower than the baseline by the threshold"""
+    baseline_dict = {x['stage']: x for x in baseline_records}
+    regressions = []
+    for record in records:
+        baseline = baseline_dict.get(record['stage'])
+        if baseline is None:
+            continue
+        delta = record['min_ms'] - baseline['min_ms']
+        if delta > min_ms and delta > baseline['min_ms'] * threshold:
+            regressions.append((record['stage'], baseline['min_ms'], record['min_ms']))
+
+    return regressions
+
+
+def find_baseline(history, args):
+    """Return the latest history record run with the same workload arguments, or None"""
+    workload_args = tool_get_workload_args(vars(args))
+    for x in reversed(history):
+        if tool_get_workload_args(x.get('args', {})) == workload_args:
+            return x
+    return None
+
+
+def load_history(history_file_path):
+    history = []
+    if os.path.isfile(history_file_path):
+        with open(history_file_path, 'r') as f:
+            history = [json.loads(x) for x in f if x.strip()]
+    return history
+
+
+def run_command_parser():
+    my_parser = argparse.ArgumentParser(description='Benchmark the show_source_code pipeline against local fixtures')
+    my_parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1000, 5000, 10000], help='The pod counts of the Podfile.lock files')
+    my_parser.add_argument('-p', '--pods', type=int, default=10, help='The number of pods to map')
+    my_parser.add_argument('-f', '--files', type=int, default=20, help='The number of source files in every pod repository')
+    my_parser.add_argument('--frames', type=int, default=3, help='The number of frames of every pod')
+    my_parser.add_argument('-m', '--map-entries', type=int, default=1000, help='The number of existing target.source-map entries')
+    my_parser.add_argument('-l', '--latency', type=float, default=0, help='The latency in milliseconds of the podspec server')
+    my_parser.add_argument('-r', '--repeat', type=int, default=3, help='Run every stage N times')
+    my_parser.add_argument('--sparse', action='store_true', help='Enable the sparse checkout')
+    my_parser.add_argument('--history', default=HISTORY_FILE_PATH, help='The JSON lines file of the results')
+    my_parser.add_argument('-c', '--compare', action='store_true', help='Compare with the last result in the history file')
+    my_parser.add_argument('-t', '--threshold', type=float, default=0.2, help='The slowdown ratio reported as a regression')
+    my_parser.add_argument('--min-ms', type=float, default=1.0, help='Ignore the slowdown less than N milliseconds')
+    my_parser.add_argument('-v', '--verbose', action='store_true', help='Show the output of show_source_code')
+    args = my_parser.parse_args()
+    return args
+
+
+def main():
+    args = run_command_parser()
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    records = run_benchmark(args)
+
+    try:
+        commit = tool_run_git(['rev-parse', '--short', 'HEAD'], ROOT_DIR)
+    except RuntimeError:
+        commit = 'unknown'
+    history = load_history(args.history)
+    with open(args.history, 'a') as f:
+        f.write(json.dumps({'commit': commit, 'time': time.time(), 'args': vars(args), 'records': records}) + '\n')
+    print(f'\nrecorded {commit} in {args.history}')
+
+    if not args.compare:
+        return 0
+    baseline = find_baseline(history, args)
+    if baseline is None:
+        print(f'no previous result with the same arguments to compare: {tool_get_workload_args(vars(args))}')
+        return 0
+
+    regressions = compare_records(records, baseline['records'], args.threshold, args.min_ms)
+    print(f'compare with {baseline["commit"]}: {len(regressions)} regression(s)')
+    for stage, baseline_ms, min_ms in regressions:
+        print(f'[Regression] {stage}: {baseline_ms:.2f} ms -> {min_ms:.2f} ms')
+
+    return 1 if regressions else 0
+
+
+def tool_get_workload_args(args_dict):
+    # Note: the JSON history has lists for the tuples, and the older records may miss some arguments
+    return {x: args_dict.get(x) for x in WORKLOAD_ARG_NAMES}
+
+
+def tool_get_pod_name(index):
+    return f'BenchPod{index:05d}'
+
+
+def tool_run_git(git_args, cwd):
+    process = subprocess.run(['git'] + git_args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f'git {" ".join(git_args)} failed: {process.stderr.decode("utf-8", "replace")}')
+    return process.stdout.decode('utf-8').strip()
+
+
+@contextlib.contextmanager
+def tool_quiet(enabled):
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# A minimal stand-in of the lldb module for benchmark_show_source_code.py
+#
+# It only implements what the show_source_code pipeline calls outside a real process:
+# SBCommandReturnObject, and the `settings set/show/append/clear target.source-map` commands
+
+import shlex
+import sys
+
+LLDB_INVALID_ADDRESS = 0xffffffffffffffff
+
+
+class SBCommandReturnObject(object):
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        self.output = ''
+        self.error = ''
+        self.succeeded = True
+
+    def Succeeded(self):
+        return self.succeeded
+
+    def GetOutput(self, *args):
+        return self.output
+
+    def GetError(self, *args):
+        return self.error
+
+    def SetError(self, error):
+        self.error = error
+        self.succeeded = False
+
+    def AppendMessage(self, message):
+        self.output += message + '\n'
+
+
+class SBCommandInterpreter(object):
+    def __init__(self, debugger):
+        self.debugger = debugger
+
+    def HandleCommand(self, command, result, *args):
+        result.Clear()
+        self.debugger.commands.append(command)
+        components = shlex.split(command)
+        if components[:2] == ['settings', 'show'] and components[2:] == ['target.source-map']:
+            lines = ['target.source-map (path-map) =']
+            for index, (k, v) in enumerate(self.debugger.source_map):
+                lines.append(f'[{index}] "{k}" -> "{v}"')
+            result.output = '\n'.join(lines) + '\n'
+        elif components[:2] in (['settings', 'set'], ['settings', 'append']) and components[2:3] == ['target.source-map']:
+            values = components[3:]
+            if len(values) % 2 != 0:
+                result.SetError('source-map needs pairs of paths')
+                return
+            pairs = list(zip(values[0::2], values[1::2]))
+            if components[1] == 'set':
+                self.debugger.source_map = pairs
+            else:
+                self.debugger.source_map.extend(pairs)
+        elif components[:3] == ['settings', 'clear', 'target.source-map']:
+            self.debugger.source_map = []
+
+
+class SBDebugger(object):
+    def __init__(self):
+        self.source_map = []
+        self.commands = []
+
+    def GetCommandInterpreter(self):
+        return SBCommandInterpreter(self)
+
+    def HandleCommand(self, command):
+        self.GetCommandInterpreter().HandleCommand(command, SBCommandReturnObject())
+
+
+debugger = SBDebugger()
+
+
+def install():
+    """Make `import lldb` return this module"""
+    sys.modules['lldb'] = sys.modules[__name__]
@@ -18,6 +18,19 @@
 # command script import ~/lldb_scripts/example/01_use_stop_hook/use_stophook.py
 # target stop-hook add -P use_stophook.StopHook -k "symbol" -v "x::y::z::CreateSomething" -k "repo_root" -v "~/path/to/repo/root"
 # br set -M "x::y::z::CreateSomething"
+#
+# Many symbols and repos:
+# - "symbol" accepts the symbols separated by `;`, the value is read up to 4095 characters,
+#   use "symbol_file" for the longer lists
+# - "symbol_file" is a file with one symbol per line, and an optional repo root after a tab,
+#   e.g. `x::y::z::CreateSomething<TAB>~/path/to/repo/root`
+# - "repo_root" accepts the repo roots separated by `,`, they're searched in order for the
+#   symbols without their own repo root
+#
+# target stop-hook add -P use_stophook.StopHook -k "symbol_file" -v "~/symbols.txt" -k "repo_root" -v "~/repo1,~/repo2"
+#
+# The symbols are resolved to address ranges when the process stops the first time and when
+# new modules are loaded, then every stop only looks up the pc in the sorted ranges
 # 
 
 # Usage1
@@ -30,8 +43,20 @@ search_symbol_name = None
 This script demonstrates the usage of stop-hook
 """
 
+import bisect
 import lldb
 import os
+import sys
+
+# Note: use the shared source_path_resolver.py and source_file_index.py in the repo root folder.
+# Usage1 copies this script to another repo without them, then fall back to the linear search
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+try:
+    import source_file_index
+    import source_path_resolver
+except ImportError:
+    source_file_index = None
+    source_path_resolver = None
 
 class StopHook:
     """
@@ -41,11 +66,97 @@ class StopHook:
     dict: An implementation detail provided by lldb.
     """
     def __init__(self, target, extra_args, internal_dict):
-      self.source_mapped = False
-      self.symbol_name = extra_args.GetValueForKey("symbol").GetStringValue(100)
-      self.repo_root_path = extra_args.GetValueForKey("repo_root").GetStringValue(100)
-      print("[stop-hook] get symbol:", self.symbol_name)
-      print("[stop-hook] repo root:", self.repo_root_path)
+      # Note: Usage1 has no repo_root, the script is placed in the repo root folder
+      repo_root_value = self.get_extra_arg(extra_args, "repo_root") or os.path.dirname(os.path.realpath(__file__))
+      self.repo_root_paths = [x.strip() for x in repo_root_value.split(',') if x.strip()]
+      # Note: symbol name -> the repo roots to search its source file
+      self.symbol_repo_dict = {}
+      for x in self.get_extra_arg(extra_args, "symbol").split(';'):
+        if x.strip():
+          self.symbol_repo_dict[x.strip()] = self.repo_root_paths
+      symbol_file_path = self.get_extra_arg(extra_args, "symbol_file")
+      if symbol_file_path:
+        self.load_symbol_file(os.path.expanduser(symbol_file_path))
+
+      print("[stop-hook] get symbols:", len(self.symbol_repo_dict))
+      print("[stop-hook] repo roots:", self.repo_root_paths)
+      # Note: the file name indexes are loaded and refreshed the first time a symbol hits
+      self.file_indexes = {}
+      self.updated_file_indexes = set()
+      self.mapped_symbols = set()
+      # Note: sorted (start, end, symbol name) of the load addresses, see resolve_symbol_ranges
+      self.range_starts = []
+      self.ranges = []
+      self.unresolved_symbols = set(self.symbol_repo_dict.keys())
+      self.resolved_key = None
+
+    def get_extra_arg(self, extra_args, key):
+      value = extra_args.GetValueForKey(key)
+      if value is None or not value.IsValid():
+        return ''
+      # Note: GetStringValue reads at most max_len - 1 characters, the longer values are cut off silently
+      max_len = 4096
+      string_value = value.GetStringValue(max_len)
+      if len(string_value) >= max_len - 1:
+        print(f'[stop-hook] [Warning] the value of "{key}" may be truncated at {max_len - 1} characters, use "symbol_file" for many symbols')
+      return string_value.strip()
+
+    def load_symbol_file(self, symbol_file_path):
+      with open(symbol_file_path, 'r') as f:
+        for line in f:
+          line = line.rstrip('\n')
+          if len(line.strip()) == 0 or line.startswith('#'):
+            continue
+          symbol_name, _, repo_root = line.partition('\t')
+          repo_roots = [repo_root.strip()] if repo_root.strip() else self.repo_root_paths
+          self.symbol_repo_dict[symbol_name.strip()] = repo_roots
+
+    def resolve_symbol_ranges(self, target):
+      """Find the address ranges of the symbols, only when the process or the module count changed"""
+      # Note: the load addresses change with a new process, and new modules may have the symbols
+      resolved_key = (target.GetProcess().GetUniqueID(), target.GetNumModules())
+      if resolved_key == self.resolved_key:
+        return
+      self.resolved_key = resolved_key
+
+      ranges = set()
+      unresolved_symbols = set()
+      for symbol_name in self.symbol_repo_dict.keys():
+        count = len(ranges)
+        for context in target.FindFunctions(symbol_name, lldb.eFunctionNameTypeAuto):
+          function = context.GetFunction()
+          owner = function if function.IsValid() else context.GetSymbol()
+          start = owner.GetStartAddress().GetLoadAddress(target)
+          end = owner.GetEndAddress().GetLoadAddress(target)
+          if start != lldb.LLDB_INVALID_ADDRESS and end != lldb.LLDB_INVALID_ADDRESS and start < end:
+            ranges.add((start, end, symbol_name))
+        if len(ranges) == count:
+          unresolved_symbols.add(symbol_name)
+
+      self.ranges = sorted(ranges)
+      self.range_starts = [x[0] for x in self.ranges]
+      self.unresolved_symbols = unresolved_symbols
+      print(f'[stop-hook] resolved {len(self.ranges)} address ranges, {len(unresolved_symbols)} symbols unresolved')
+
+    def find_symbol(self, frame):
+      """Return the watched symbol name of the frame, or None"""
+      pc = frame.GetPC()
+      index = bisect.bisect_right(self.range_starts, pc) - 1
+      # Note: the ranges of the functions don't overlap, only check the nearest one
+      if index >= 0 and pc < self.ranges[index][1]:
+        return self.ranges[index][2]
+
+      if len(self.unresolved_symbols) == 0:
+        return None
+
+      # Note: fall back to the name for the symbols without address ranges
+      current_symbol_name = frame.GetSymbol().GetName()
+      if current_symbol_name is None:
+        return None
+      if current_symbol_name in self.unresolved_symbols:
+        return current_symbol_name
+      tidied_current_symbol_name = current_symbol_name.split('(')[0]
+      return tidied_current_symbol_name if tidied_current_symbol_name in self.unresolved_symbols else None
 
     """
     exe_ctx: An SBExecutionContext for the thread that has stopped.
@@ -59,20 +170,19 @@ class StopHook:
     def handle_stop(self, exe_ctx, stream):
       target = exe_ctx.GetTarget()
       current_frame = exe_ctx.GetFrame()
-      current_symbol_name = current_frame.GetSymbol().GetName()
-      tidied_current_symbol_name = current_symbol_name if current_symbol_name.find('(') == -1 else current_symbol_name.split('(')[0]
+      self.resolve_symbol_ranges(target)
+      symbol_name = self.find_symbol(current_frame)
 
-      # Note: If the breakpoint for self.symbol_name is hitting, just ignore this  
+      # Note: If the breakpoint for a watched symbol is hitting, just ignore this
       # breakpoint and continue. Otherwise, keep the stop for other breakpoints
-      if current_symbol_name is not None and (current_symbol_name == self.symbol_name or tidied_current_symbol_name == self.symbol_name):
+      if symbol_name is not None:
         should_stop = False
 
-        if self.source_mapped:
-           print(f'[stop-hook] source map is already done, just skip it.')
+        if symbol_name in self.mapped_symbols:
+           print(f'[stop-hook] source map of {symbol_name} is already done, just skip it.')
            return should_stop
 
-        print(f'[stop-hook] matching symbol: {self.symbol_name} and continue the program')
-        #symbol_contexts = target.FindGlobalFunctions(self.symbol_name, 0, lldb.eMatchTypeNormal)
+        print(f'[stop-hook] matching symbol: {symbol_name} and continue the program')
         context = current_frame.GetSymbolContext(lldb.eSymbolContextEverything)
         line_number = current_frame.GetLineEntry().GetLine()
         source_file_path = f"{context.GetCompileUnit().GetFileSpec()}"
@@ -80,7 +190,11 @@ class StopHook:
 
         print(f"[stop-hook] compiled symbol source file: {source_file_path}:{line_number}")
 
-        local_source_file_path = self.search_file_path(self.repo_root_path, file_name)
+        local_source_file_path = None
+        for repo_root_path in self.symbol_repo_dict[symbol_name]:
+          local_source_file_path = self.search_file_path(repo_root_path, file_name, source_file_path)
+          if local_source_file_path:
+            break
         if local_source_file_path:
            print(f"[stop-hook] local symbol source file: {local_source_file_path}")
 
@@ -91,17 +205,38 @@ class StopHook:
         else:
            print(f'[stop-hook] not find file: {file_name}')
 
-        self.source_mapped = True
+        self.mapped_symbols.add(symbol_name)
       else:
         should_stop = True
-        print(f'[stop-hook] target `{target}` stopped at symbol: {current_symbol_name}')
+        print(f'[stop-hook] target `{target}` stopped at symbol: {current_frame.GetSymbol().GetName()}')
 
       return should_stop
     
     """
     Utility
     """
-    def search_file_path(self, directory_path, target_filename):
+    def search_file_path(self, repo_root_path, target_filename, build_path=None):
+      if source_file_index is None:
+        return self.walk_file_path(repo_root_path, target_filename)
+
+      file_index = self.file_indexes.get(repo_root_path)
+      if file_index is None:
+        file_index = self.file_indexes[repo_root_path] = source_file_index.SourceFileIndex(repo_root_path)
+
+      if repo_root_path not in self.updated_file_indexes:
+        changed_count = file_index.update()
+        self.updated_file_indexes.add(repo_root_path)
+        print(f'[stop-hook] file index of {repo_root_path}: {len(file_index.dir_dict)} folders, {changed_count} changed')
+        return file_index.find(target_filename, build_path)
+
+      file_path = file_index.find(target_filename, build_path)
+      if file_path is None or not os.path.isfile(file_path):
+        # Note: the file may be added or moved after the index refreshed, refresh it again
+        file_index.update()
+        file_path = file_index.find(target_filename, build_path)
+      return file_path
+
+    def walk_file_path(self, directory_path, target_filename):
       directory_path = os.path.expanduser(directory_path)
       for root, dirs, files in os.walk(directory_path):
         for file in files:
@@ -114,16 +249,19 @@ class StopHook:
     Utility
     """
     def find_common_suffix(self, str1, str2):
-      common_suffix = ""
-      i = len(str1) - 1
-      j = len(str2) - 1
-    
-      while i >= 0 and j >= 0 and str1[i] == str2[j]:
-        common_suffix = str1[i] + common_suffix
-        i -= 1
-        j -= 1
-    
-      return common_suffix, str1[:i+1], str2[:j+1]
+      # Note: compare the path components, not the characters, e.g. /a/foo.m and /b/xfoo.m have no common suffix
+      if source_path_resolver is not None:
+        return source_path_resolver.split_common_suffix(str1, str2)
+
+      components1 = str1.rstrip('/').split('/')
+      components2 = str2.rstrip('/').split('/')
+      count = 0
+      while (count < len(components1) - 1 and count < len(components2) - 1
+             and components1[-1 - count] == components2[-1 - count]):
+        count += 1
+      if count == 0:
+        return '', str1, str2
+      return '/'.join(components1[-count:]), '/'.join(components1[:-count]) or '/', '/'.join(components2[:-count]) or '/'
 
 
 def __lldb_init_module(debugger, internal_dict):
@@ -2,20 +2,65 @@
 # -*- coding: UTF-8 -*-
 
 # from optparse import OptionParser
-from urllib.request import urlopen
-from urllib.error import URLError
-
 import argparse
+import atomic_file_writer
+import concurrent.futures
+import gzip
+import hashlib
+import http.client
 import lldb
 import os
 import json
 import lldbutil
+import parse_podfile_lock_file
+import plistlib
+import podspec_http_client
 import shlex
+import source_map_store
+import source_path_resolver
+import shutil
 import subprocess
+import tarfile
 import re
+import threading
+import time
+from collections import OrderedDict
 
 
 failedLibs = set()
+# Note: the downloaded sources, the podspecs and the caches
+SOURCE_CODE_DIR = '/tmp/show_source_code'
+# Note: Podfile.lock path -> ((mtime, size), pod version dictionary)
+podfile_lock_cache = {}
+# Note: DerivedData path -> ((mtime, size), WorkspacePath in its info.plist)
+workspace_path_cache = {}
+# Note: (pod_name, pod_version) -> the future of the in-flight pod source download
+pod_download_futures = {}
+pod_download_lock = threading.Lock()
+# Note: the background jobs started by `show_source_code -a`, see start_background_job
+source_map_jobs = []
+source_map_jobs_lock = threading.Lock()
+# Note: the shared bare repositories, one per git url, see download_git_repo
+GIT_CACHE_DIR = os.path.join(SOURCE_CODE_DIR, '.git_cache')
+GIT_CACHE_INDEX_FILE_PATH = os.path.join(GIT_CACHE_DIR, 'index.json')
+git_cache_lock = threading.Lock()
+git_cache_repo_locks = {}
+# Note: the podspec cache, the index has keys: fetched_at、last_used、etag、last_modified
+PODSPEC_INDEX_FILE_PATH = os.path.join(SOURCE_CODE_DIR, 'podspec_index.json')
+podspec_cache_lock = threading.Lock()
+podspec_memory_cache = {}
+# Note: the UUIDs of the modules prewarmed, see prewarm_modules
+prewarmed_module_keys = set()
+prewarm_lock = threading.Lock()
+
+# Note: the `data` filter of tarfile rejects the unsafe members, it's only in the newer Python versions
+TAR_EXTRACT_OPTIONS = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+
+## Background job status
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_FINISHED = 'finished'
+JOB_FAILED = 'failed'
 
 
 def show_source_code(debugger, command, result, internal_dict):
@@ -64,10 +109,22 @@ def show_source_code(debugger, command, result, internal_dict):
     parser.add_argument("-t", "--thread", action="store_true", default=False, help="current thread all frames source code mapping")
     parser.add_argument("-c", "--clean", action="store_true", default=False, help="clean global memory data, e.g. env file")
     parser.add_argument("-d", "--debug", action="store_true", default=False, help="current frame source code debug")
+    parser.add_argument("-a", "--async", dest="background", action="store_true", default=False, help="download and map source code in background, keep debugging")
+    parser.add_argument("-s", "--status", action="store_true", default=False, help="list the pending, finished and failed background jobs")
+    parser.add_argument("-w", "--prewarm", action="store_true", default=False, help="download the pods of all compile units in background")
 
     # Execute the parse_args() method
     options = parser.parse_args(command_args)
 
+    if options.status:
+        print_background_jobs()
+        return
+
+    if options.prewarm:
+        if not start_prewarm_job(debugger.GetSelectedTarget()):
+            print('[show_source_code] all modules are already prewarmed')
+        return
+
     debugger.HandleCommand('settings set frame-format ${function.name}')
     state = lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread().GetSelectedFrame().GetDisplayFunctionName()
     executable_path = debugger.GetSelectedTarget().GetExecutable().GetDirectory()
@@ -79,27 +136,25 @@ def show_source_code(debugger, command, result, internal_dict):
         if pod_version is None:
             print(f'[Error] must provide pod version for {pod_name} which given in CLI command or Podfile.lock')
             return
-        git_info = get_git_info_dict(pod_name, pod_version)
-        if git_info is None:
-            print(f'[Error] get git info failed: {git_info}')
+        if options.background:
+            start_background_job(f'download {pod_name} ({pod_version})', download_pod_source, pod_name, pod_version)
             return
-        git_url = git_info['git_url']
-        git_commit = git_info['git_commit']
-        print(f"git_info: {git_info}")
-        download_dir = download_git_repo(git_url, git_commit, pod_name, pod_version)
-        print(f'Download source code at {download_dir}')
-        print('Done!🍺🍺🍺')      
+        download_pod_source(pod_name, pod_version)
     elif options.pod_name is None and options.pod_version:
         print(f'[Error] need provide a name for pod version `{options.pod_version}`')
         parser.print_help()
     elif options.thread:
         print("process all frames target source map")
-        thread_all_frame_map(executable_path, debugger)
+        thread_all_frame_map(executable_path, debugger, options.background)
     elif options.process:
         print("thread all frames target source map")
-        process_all_frame_map(executable_path, debugger)
+        process_all_frame_map(executable_path, debugger, options.background)
     elif options.clean:
         globals().pop('_show_source_code_env', None)
+        globals().pop('_show_source_code_path_resolver', None)
+        podfile_lock_cache.clear()
+        workspace_path_cache.clear()
+        podspec_memory_cache.clear()
         print('Done!🍺🍺🍺')
     else:
         ci = debugger.GetCommandInterpreter()
@@ -111,43 +166,108 @@ def show_source_code(debugger, command, result, internal_dict):
             print(res.GetError().strip())
             print('[show_source_code] no debug info for the selected frame. Use source info to check again.')
             return
+        if options.background:
+            start_background_job(f'map {source_info.strip()}', target_source_map, source_info, executable_path, debugger)
+            return
         success = target_source_map(source_info, executable_path, debugger)
         print(f'[show_source_code] mapping {source_info} failed') if success is False else None
 
 
+def download_pod_source(pod_name, pod_version):
+    # Note: join the in-flight download of the same pod version, e.g. a background job or the prewarm
+    local_source_code_prefix = resolve_pod_source_async(pod_name, pod_version).result()
+    if local_source_code_prefix is None:
+        print(f'[Error] download source code failed: {pod_name} ({pod_version})')
+        return False
+    print(f'Download source code at {os.path.dirname(local_source_code_prefix)}')
+    print('Done!🍺🍺🍺')
+    return True
+
+
+def start_background_job(description, function, *args):
+    """Run the function in a background thread, and record its status for `show_source_code -s`"""
+    job = {
+        'description': description,
+        'status': JOB_PENDING,
+        'start_time': time.time(),
+        'end_time': None,
+        'error': None,
+    }
+    # Note: the jobs may be started by the command and the prewarm at the same time, keep the ids unique
+    with source_map_jobs_lock:
+        job['id'] = len(source_map_jobs) + 1
+        source_map_jobs.append(job)
+
+    def run_job():
+        job['status'] = JOB_RUNNING
+        try:
+            job['status'] = JOB_FINISHED if function(*args) else JOB_FAILED
+        except Exception as e:
+            job['status'] = JOB_FAILED
+            job['error'] = str(e)
+        job['end_time'] = time.time()
+        print(f'[show_source_code] job #{job["id"]} {job["status"]}: {description}')
+
+    # Note: not run in the download worker pool, the job itself waits for the downloads in the pool
+    threading.Thread(target=run_job, name=f'show_source_code_job_{job["id"]}', daemon=True).start()
+    print(f'[show_source_code] job #{job["id"]} started in background: {description}')
+    print('[show_source_code] use `show_source_code -s` to check the status')
+
+
+def print_background_jobs():
+    with source_map_jobs_lock:
+        job_list = list(source_map_jobs)
+    if len(job_list) == 0:
+        print('[show_source_code] no background jobs')
+        return
+
+    status_list = [JOB_PENDING, JOB_RUNNING, JOB_FINISHED, JOB_FAILED]
+    summary = ', '.join(f'{len([x for x in job_list if x["status"] == status])} {status}' for status in status_list)
+    print(f'[show_source_code] jobs: {summary}')
+    for job in job_list:
+        seconds = (job['end_time'] or time.time()) - job['start_time']
+        error = f' ({job["error"]})' if job['error'] else ''
+        print(f'#{job["id"]:<4} {job["status"]:<9} {seconds:7.1f}s  {job["description"]}{error}')
+
+
 def get_pod_info_dict(source_info):
-    """This method get pod info into a dictionary with keys: pod_name、build_UUID"""
+    """This method get pod info into a dictionary with keys: pod_name、pod_build_prefix"""
 
     # Note: the parse Pod info is customizable, not general way
-    # e.g. ['', 'Users', 'username', '<sentinel>', '<PodName>', 'Classes', 'yyy', 'zzz.m:12']
-    source_file_path_component_list = source_info.split(': ').pop().split('/')
-
-    # Note: sentinel is the string which before the pod name, for example, /.../x/PodName/...,
-    # the x is sentinel
-    sentinel_list = get_env_dict()['pod_name_sentinel'].strip(' \'"').split(',')
-
-    index_before_pod = None
-    for sentinel in sentinel_list:
-        sentinel = sentinel.strip()
-        if sentinel in source_file_path_component_list:
-            index_before_pod = source_file_path_component_list.index(sentinel)
-            break
-
-    if index_before_pod is None:
+    # e.g. /Users/username/<sentinel>/<PodName>/Classes/yyy/zzz.m:12
+    # the sentinel is the string which before the pod name, see source_path_resolver.py
+    source_file_path = source_info.split(': ').pop()
+    info_dict = get_path_resolver().get_pod_info(source_file_path)
+    if info_dict is None:
         print(f"Error: not find pod with source info `{source_info}`")
         return None
-    
-    pod_name = source_file_path_component_list[index_before_pod + 1]
-    # Note: e.g. /Users/username/build/to/path/DGFoundation
-    pod_build_prefix = '/'.join(source_file_path_component_list[0:index_before_pod + 2])
-    info_dict = {
-        'pod_name': pod_name,
-        'pod_build_prefix': pod_build_prefix,
-    }
+
     return info_dict
 
 
+def get_path_resolver():
+    if '_show_source_code_path_resolver' not in globals():
+        sentinel_list = get_env_dict()['pod_name_sentinel'].strip(' \'"').split(',')
+        resolver = source_path_resolver.SourcePathResolver(sentinel_list)
+        resolver.add_map_dict(get_source_map_store().get_map_dict())
+        globals()['_show_source_code_path_resolver'] = resolver
+
+    return globals()['_show_source_code_path_resolver']
+
+
 def get_pod_version(pod_name, executable_path):
+    pod_version_dict = get_local_pod_version_dict(executable_path)
+    if pod_version_dict is None:
+        return None
+
+    pod_version = pod_version_dict.get(pod_name)
+    print(f"local pod version: `{pod_version}`")
+
+    return pod_version
+
+
+def get_local_pod_version_dict(executable_path):
+    """Get the pod versions from the Podfile.lock of the workspace which builds the executable"""
     derived_data_path = '/'.join(executable_path.split('/')[0:8])
     print("derivedDataPath: " + derived_data_path)
 
@@ -155,37 +275,38 @@ def get_pod_version(pod_name, executable_path):
     if podfile_lock_file_path is None or not os.path.isfile(podfile_lock_file_path):
         return None
     try:
-        script_path = os.path.join(os.path.dirname(__file__), 'parse_podfile_lock_file.py')
-        output = subprocess.check_output(
-            ['python3', f'{script_path}', '-p', f'{podfile_lock_file_path}', '-q', f'{pod_name}'])
-        output = output.decode('utf-8')
-        print(f"local pod version: `{output}`")
-    except subprocess.CalledProcessError as e:
-        print("Command execution failed!")
-    pod_dict = json.loads(output)
-    if pod_name in pod_dict:
-        pod_version = pod_dict[pod_name]
-        return pod_version
+        return get_pod_version_dict(podfile_lock_file_path)
+    except (OSError, ValueError) as e:
+        print(f"[Error] parse {podfile_lock_file_path} failed: {e}")
+        return None
+
 
-    return None
+def get_pod_version_dict(podfile_lock_file_path, use_cache=True):
+    """Parse the Podfile.lock in process, and reuse the result until the file changes
+
+    use_cache: load the parsed result from the disk cache of parse_podfile_lock_file.py, or parse the file
+    """
+    stat = os.stat(podfile_lock_file_path)
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    cached_item = podfile_lock_cache.get(podfile_lock_file_path)
+    if cached_item is not None and cached_item[0] == cache_key:
+        return cached_item[1]
+
+    if use_cache:
+        # Note: the parsed result is also cached on disk, a new lldb session doesn't parse it again
+        podfile_lock_dict = parse_podfile_lock_file.load_podfile_lock_file(podfile_lock_file_path, [parse_podfile_lock_file.POD_VERSIONS])
+    else:
+        podfile_lock_dict = parse_podfile_lock_file.parse_podfile_lock_file(podfile_lock_file_path)
+    pod_version_dict = podfile_lock_dict[parse_podfile_lock_file.POD_VERSIONS]
+    podfile_lock_cache[podfile_lock_file_path] = (cache_key, pod_version_dict)
+
+    return pod_version_dict
 
 
 def get_podfile_lock_file_path(derived_data_path):
     """get the Podfile.lock file path"""
-    info_plist_path = os.path.join(derived_data_path, 'info.plist')
-    if not os.path.isfile(info_plist_path):
-        return None
-
-    print(f'info_plist_path: {info_plist_path}')
-    # Note: info.plist is special, can't open as text using Xcode builtin Python3.9
-    output = subprocess.check_output(['xcrun', 'defaults', 'read', f'{info_plist_path}', 'WorkspacePath'])
-    # Note: there are some tricks here
-    # 1. decode('utf-8') for xml info.plist
-    # 2. encode('utf-8').decode('unicode_escape') try to fix \uXXX when the path contains chinese characters
-    output = output.decode('utf-8').encode('utf-8').decode('unicode_escape')
-    xcodeproj_or_workspace_path = output.strip('\n ')
-
-    if xcodeproj_or_workspace_path is None:
+    xcodeproj_or_workspace_path = get_workspace_path(derived_data_path)
+    if not xcodeproj_or_workspace_path:
         return None
 
     print(f'xcodeproj_or_workspace_path: {xcodeproj_or_workspace_path}')
@@ -196,6 +317,35 @@ def get_podfile_lock_file_path(derived_data_path):
     return podfile_lock_file_path
 
 
+def get_workspace_path(derived_data_path):
+    """Read WorkspacePath from the info.plist of the DerivedData folder, and reuse it until the file changes"""
+    info_plist_path = os.path.join(derived_data_path, 'info.plist')
+    try:
+        stat = os.stat(info_plist_path)
+    except OSError:
+        return None
+
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    cached_item = workspace_path_cache.get(derived_data_path)
+    if cached_item is not None and cached_item[0] == cache_key:
+        return cached_item[1]
+
+    print(f'info_plist_path: {info_plist_path}')
+    # Note: info.plist may be a binary or a XML plist, plistlib reads both and keeps the non-ASCII characters
+    try:
+        with open(info_plist_path, 'rb') as f:
+            info_dict = plistlib.load(f)
+    except (OSError, ValueError, plistlib.InvalidFileException) as e:
+        print(f'[Error] read {info_plist_path} failed: {e}')
+        return None
+
+    workspace_path = info_dict.get('WorkspacePath') if isinstance(info_dict, dict) else None
+    workspace_path = workspace_path.strip('\n ') if isinstance(workspace_path, str) else None
+    workspace_path_cache[derived_data_path] = (cache_key, workspace_path)
+
+    return workspace_path
+
+
 def get_env_dict():
     if '_show_source_code_env' in globals():
         return globals()['_show_source_code_env']
@@ -220,36 +370,10 @@ def get_env_dict():
 
 
 def get_git_info_dict(pod_name, pod_version):
-    podspec_file_path = f'/tmp/show_source_code/{pod_name}-{pod_version}.json'
     env_dict = get_env_dict()
-    content_dict = {}
-
-    # Note: if SNAPSHOT version always query server to get latest podspec
-    if os.path.isfile(podspec_file_path) and 'snapshot' not in pod_version.lower():
-        with open(podspec_file_path) as f:
-            content = f.read()
-            content_dict = json.loads(content)
-            f.close()
-
-    if len(content_dict) == 0:
-        url = env_dict['podspec_query_api'].strip(" '\"")
-        formatted_url = url.format(pod_name=pod_name, pod_version=pod_version)
-        print(f'request url: {formatted_url}')
-        try:
-            content = urlopen(formatted_url).read()
-        except URLError as e:
-            print(f"[Error] URL Error occurred: {e}")
-            return None
-        except Exception as e:
-            print(f"[Error] An error occurred: {e}")
-            return None
-        try:
-            content_dict = json.loads(content)
-        except ValueError:
-            print(f"[Error] need a valid JSON string, but got: `{content}`")
-            return None
-    else:
-        print(f'Use cached podspec: {podspec_file_path}')
+    content_dict = get_podspec_dict(pod_name, pod_version)
+    if content_dict is None:
+        return None
 
     git_url_key = env_dict['git_url_keypath'].strip(" '\"")
     git_commit_key = env_dict['git_commit_keypath'].strip(" '\"")
@@ -259,54 +383,560 @@ def get_git_info_dict(pod_name, pod_version):
         'git_commit': tool_get_value_by_key_path(content_dict, git_commit_key),
     }
 
-    os.makedirs(os.path.dirname(podspec_file_path), exist_ok=True)
-    with open(podspec_file_path, "w") as f:
-        f.write(json.dumps(content_dict))
-        f.close()
-
     return dict_value
 
 
-def download_git_repo(git_url, git_commit, pod_name, pod_version):
-    download_dir = os.path.join('/tmp/show_source_code', pod_name, pod_version)
-    #download_file_path = os.path.join(download_dir, 'download.tar')
+def get_podspec_dict(pod_name, pod_version):
+    """Get the podspec from the memory cache, the disk cache or the server
+
+    The released versions are cached forever. The SNAPSHOT versions are cached for
+    `podspec_snapshot_ttl` seconds, then revalidated by ETag/Last-Modified.
+    """
+    cache_key = f'{pod_name}-{pod_version}'
+    podspec_file_path = os.path.join(SOURCE_CODE_DIR, f'{cache_key}.json')
+    is_snapshot = 'snapshot' in pod_version.lower()
+    snapshot_ttl = int(get_env_dict().get('podspec_snapshot_ttl', '300').strip(" '\""))
+    now = time.time()
+
+    def is_fresh(fetched_at):
+        return not is_snapshot or now - fetched_at < snapshot_ttl
+
+    memory_item = podspec_memory_cache.get(cache_key)
+    if memory_item is not None and is_fresh(memory_item['fetched_at']):
+        return memory_item['content']
+
+    with podspec_cache_lock:
+        index = tool_load_json_file(PODSPEC_INDEX_FILE_PATH)
+    entry = index.get(cache_key)
+    if entry is not None and not os.path.isfile(podspec_file_path):
+        entry = None
+
+    if entry is not None and is_fresh(entry['fetched_at']):
+        print(f'Use cached podspec: {podspec_file_path}')
+        content_dict = tool_load_json_file(podspec_file_path)
+    else:
+        headers = {}
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        response = request_podspec(pod_name, pod_version, headers)
+        if response is None and entry is None:
+            return None
+        elif response is None:
+            print(f'[Warning] use the stale podspec: {podspec_file_path}')
+            content_dict = tool_load_json_file(podspec_file_path)
+        elif response['status'] == 304:
+            print(f'Podspec not modified: {podspec_file_path}')
+            content_dict = tool_load_json_file(podspec_file_path)
+            entry['fetched_at'] = now
+        else:
+            content_dict = response['content']
+            tool_save_json_file(podspec_file_path, content_dict)
+            entry = {
+                'fetched_at': now,
+                'etag': response['etag'],
+                'last_modified': response['last_modified'],
+            }
+
+    entry['last_used'] = now
+    podspec_memory_cache[cache_key] = {
+        'content': content_dict,
+        'fetched_at': entry['fetched_at'],
+    }
+    with podspec_cache_lock:
+        # Note: reload the index, another thread or lldb session may have changed it
+        index = tool_load_json_file(PODSPEC_INDEX_FILE_PATH)
+        index[cache_key] = entry
+        evict_podspec_cache(index)
+        tool_save_json_file(PODSPEC_INDEX_FILE_PATH, index)
 
-    if not os.path.exists(download_dir):
-        # Note: this way not works
-        # @see https://stackoverflow.com/questions/11018411/how-do-i-export-a-specific-commit-with-git-archive
-        #git_download_cmd = f"git archive --remote={git_url} {git_commit} > {download_file_path}"
-        #unarchive_cmd = f'cd {download_dir}; tar -xvf {download_file_path}'
-        #print(f'execute `{git_download_cmd}`')
-        #print(f'execute `{unarchive_cmd}`')
+    return content_dict
 
-        os.system(f'mkdir -p {download_dir}')
-        print(f'download_git_repo: {download_dir}')
-        os.system(f'cd {download_dir}; git init; git remote add origin {git_url}; git fetch --depth 1 origin {git_commit}; git checkout FETCH_HEAD')
 
+def request_podspec(pod_name, pod_version, headers):
+    """Query the podspec server. Return a dictionary with keys: status、content、etag、last_modified, or None if failed"""
+    url = get_env_dict()['podspec_query_api'].strip(" '\"")
+    formatted_url = url.format(pod_name=pod_name, pod_version=pod_version)
+    print(f'request url: {formatted_url}')
+    try:
+        response = get_http_client().get(formatted_url, headers)
+    except podspec_http_client.HttpClientError as e:
+        print(f"[Error] {e}")
+        return None
+
+    if response.status == 304:
+        return {
+            'status': 304,
+            'content': None,
+            'etag': None,
+            'last_modified': None,
+        }
+    elif response.status != 200:
+        print(f"[Error] HTTP Error occurred: {response.status} {formatted_url}")
+        return None
+
+    try:
+        content_dict = json.loads(response.body)
+    except ValueError:
+        print(f"[Error] need a valid JSON string, but got: `{response.body}`")
+        return None
+
+    return {
+        'status': response.status,
+        'content': content_dict,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def get_podspec_dict_batch(pod_version_list):
+    """Query the podspecs of the (pod_name, pod_version) list concurrently. Return a dictionary of (pod_name, pod_version) -> podspec"""
+    # Note: the executor of the http client lives as long as the client, the batches reuse its threads and connections
+    executor = get_http_client().get_executor()
+    future_dict = {executor.submit(get_podspec_dict, x[0], x[1]): x for x in dict.fromkeys(pod_version_list)}
+    podspec_dict = {}
+    for future in concurrent.futures.as_completed(future_dict):
+        pod_name, pod_version = future_dict[future]
+        # Note: one failed query must not drop the podspecs of the others, treat it as not found
+        try:
+            podspec_dict[(pod_name, pod_version)] = future.result()
+        except Exception as e:
+            print(f'[Error] query podspec of {pod_name} ({pod_version}) failed: {e}')
+            podspec_dict[(pod_name, pod_version)] = None
+    return podspec_dict
+
+
+def get_http_client():
+    if '_show_source_code_http_client' not in globals():
+        env_dict = get_env_dict()
+        # Note: configure `podspec_request_timeout` (seconds), `podspec_request_retries` and
+        # `podspec_query_workers` in the .env file
+        globals()['_show_source_code_http_client'] = podspec_http_client.HttpClient(
+            timeout=float(env_dict.get('podspec_request_timeout', '10').strip(" '\"")),
+            retries=int(env_dict.get('podspec_request_retries', '2').strip(" '\"")),
+            max_workers=int(env_dict.get('podspec_query_workers', '8').strip(" '\"")))
+
+    return globals()['_show_source_code_http_client']
+
+
+def evict_podspec_cache(index):
+    # Note: configure `podspec_cache_max_entries` in the .env file, default is 1000
+    max_entries = int(get_env_dict().get('podspec_cache_max_entries', '1000').strip(" '\""))
+    if len(index) <= max_entries:
+        return
+
+    sorted_keys = sorted(index.keys(), key=lambda x: index[x].get('last_used', 0))
+    for cache_key in sorted_keys[:len(index) - max_entries]:
+        del index[cache_key]
+        podspec_memory_cache.pop(cache_key, None)
+        podspec_file_path = os.path.join(SOURCE_CODE_DIR, f'{cache_key}.json')
+        if os.path.isfile(podspec_file_path):
+            os.remove(podspec_file_path)
+
+
+def download_git_repo(git_url, git_commit, pod_name, pod_version, source_paths=None):
+    """Check out the commit. If source_paths given and `sparse_checkout = true` in .env, only check out these repository relative paths"""
+    download_dir = os.path.join(SOURCE_CODE_DIR, pod_name, pod_version)
+    #download_file_path = os.path.join(download_dir, 'download.tar')
+    cache_dir = get_git_cache_dir(git_url)
+    sparse = bool(source_paths) and is_sparse_checkout_enabled()
+
+    if os.path.exists(download_dir):
+        if sparse:
+            add_sparse_checkout_paths(download_dir, source_paths)
+        update_git_cache_index(git_url, cache_dir)
+        return download_dir
+
+    # Note: this way not works
+    # @see https://stackoverflow.com/questions/11018411/how-do-i-export-a-specific-commit-with-git-archive
+    #git_download_cmd = f"git archive --remote={git_url} {git_commit} > {download_file_path}"
+    #unarchive_cmd = f'cd {download_dir}; tar -xvf {download_file_path}'
+    #print(f'execute `{git_download_cmd}`')
+    #print(f'execute `{unarchive_cmd}`')
+
+    # Note: the downloads of the same git url are serialized, check the checkout again in the lock,
+    # another thread may have finished it, e.g. a prewarm or background job
+    with get_git_cache_repo_lock(cache_dir):
+        if os.path.exists(download_dir):
+            if sparse:
+                add_sparse_checkout_paths(download_dir, source_paths)
+            checked_out = True
+        else:
+            checked_out = checkout_git_repo(git_url, git_commit, pod_name, pod_version, source_paths, download_dir, cache_dir, sparse)
+
+    if not checked_out:
+        return None
+
+    # Note: the archive checkouts are recorded under the entry of their git url too, without a bare
+    # repository, so they count towards `git_cache_max_size_mb` and are evicted with the worktrees
+    update_git_cache_index(git_url, cache_dir, download_dir)
     return download_dir
 
 
-def get_saved_map_lines(source_map_file_path, current_local_source_code_prefix):
-    map_string_lines = []
-    if os.path.isfile(source_map_file_path):
-        with open(source_map_file_path, "r") as f:
-            seen_set = set()
-            lines = f.readlines()
-            for line in lines:
-                line = line.strip()
-                line = line.strip(' \n')
-                if len(line) == 0:
-                    continue
-                components = line.split(' ')
-                if len(components) != 2:
+def checkout_git_repo(git_url, git_commit, pod_name, pod_version, source_paths, download_dir, cache_dir, sparse):
+    """Download the archive or check out the worktree into download_dir. Must be called with the repository lock held"""
+    print(f'download_git_repo: {download_dir}')
+    os.makedirs(os.path.dirname(download_dir), exist_ok=True)
+    archive_url = get_archive_url(git_url, git_commit)
+    if archive_url:
+        if download_archive(archive_url, download_dir):
+            return True
+        print(f'[Warning] download archive failed, fall back to git: {archive_url}')
+
+    # Note: all versions of the same git url share one bare repository, and every version
+    # is a worktree of it, so checking out another version only fetches the delta
+    if sparse:
+        # Note: fetch the commit and trees without blobs (partial clone), then the sparse checkout
+        # only downloads the blobs of the source files referenced by debug info
+        git_cmd_list = [
+            ['git', '-C', cache_dir, 'fetch', '-q', '--depth', '1', '--filter=blob:none', 'origin', git_commit],
+            ['git', '-C', cache_dir, 'worktree', 'add', '--no-checkout', '--detach', download_dir, git_commit],
+            ['git', '-C', download_dir, 'sparse-checkout', 'set', '--no-cone'] + tool_get_sparse_checkout_patterns(source_paths),
+            ['git', '-C', download_dir, 'checkout', '-q', '--detach', git_commit],
+        ]
+    else:
+        git_cmd_list = [
+            ['git', '-C', cache_dir, 'fetch', '-q', '--depth', '1', git_url, git_commit],
+            ['git', '-C', cache_dir, 'worktree', 'add', '--detach', download_dir, git_commit],
+        ]
+
+    if not os.path.isdir(cache_dir):
+        subprocess.run(['git', 'init', '-q', '--bare', cache_dir], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if sparse:
+        # Note: the partial clone needs a named promisor remote, it fails if the remote already exists
+        subprocess.run(['git', '-C', cache_dir, 'remote', 'add', 'origin', git_url], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Note: only remove the checkout created by this call, never a folder which existed before
+    created_download_dir = False
+    for git_cmd in git_cmd_list:
+        process = subprocess.run(git_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            error_message = process.stderr.decode('utf-8', 'replace').strip()
+            print(f'[Error] `{" ".join(git_cmd)}` failed for {pod_name} ({pod_version}): {error_message}')
+            if created_download_dir:
+                # Note: remove the incomplete checkout, so the next time download it again
+                shutil.rmtree(download_dir, ignore_errors=True)
+                subprocess.run(['git', '-C', cache_dir, 'worktree', 'prune'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            return False
+        if git_cmd[3:5] == ['worktree', 'add']:
+            created_download_dir = True
+
+    return True
+
+
+def get_archive_url(git_url, git_commit):
+    """Get the archive url of the commit by `git_archive_url_template` in the .env file, or None if not configured
+
+    The template supports {git_url}、{repo_path}、{repo_name}、{git_commit}, e.g.
+    https://git.example.com/{repo_path}/-/archive/{git_commit}/{repo_name}-{git_commit}.tar.gz
+    """
+    template = get_env_dict().get('git_archive_url_template', '').strip(" '\"")
+    if not template:
+        return None
+
+    repo_path = tool_get_repo_path(git_url)
+    return template.format(git_url=git_url, repo_path=repo_path, repo_name=os.path.basename(repo_path), git_commit=git_commit)
+
+
+def download_archive(archive_url, download_dir):
+    """Stream the tar or tar.gz archive and extract it into download_dir without saving the archive. Return True if succeed"""
+    # Note: the archives have a top-level folder, e.g. <repo_name>-<git_commit>/, configure `git_archive_strip_components`
+    strip_count = int(get_env_dict().get('git_archive_strip_components', '1').strip(" '\""))
+    partial_dir = f'{download_dir}.partial-{os.getpid()}-{threading.get_ident()}'
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    print(f'download archive: {archive_url}')
+
+    try:
+        response = get_http_client().get_stream(archive_url)
+    except podspec_http_client.HttpClientError as e:
+        print(f'[Error] {e}')
+        return False
+
+    try:
+        if response.status != 200:
+            print(f'[Error] HTTP Error occurred: {response.status} {archive_url}')
+            return False
+
+        # Note: GzipFile checks the CRC and the size at the end of the stream, and http.client raises
+        # IncompleteRead if the body is shorter than Content-Length or the chunks
+        fileobj = gzip.GzipFile(fileobj=response, mode='rb') if response.peek(2)[:2] == b'\x1f\x8b' else response
+        file_count = 0
+        with tarfile.open(fileobj=fileobj, mode='r|') as tar:
+            for member in tar:
+                if not tool_strip_tar_member(member, strip_count):
                     continue
-                path = components[1]
-                if os.path.exists(path):
-                    if path != current_local_source_code_prefix and line not in seen_set:
-                        print(f'use cached map: `{line}`')
-                        seen_set.add(line)
-                        map_string_lines.append(line)
-    return map_string_lines
+                if not tool_is_safe_tar_member(member):
+                    print(f'[Error] unsafe path in archive: {member.name}')
+                    return False
+                tar.extract(member, partial_dir, **TAR_EXTRACT_OPTIONS)
+                file_count += 1
+        while fileobj.read(65536):
+            pass
+
+        if file_count == 0:
+            print(f'[Error] empty archive: {archive_url}')
+            return False
+        os.rename(partial_dir, download_dir)
+        print(f'extract {file_count} files to {download_dir}')
+        return True
+    except (OSError, EOFError, tarfile.TarError, http.client.HTTPException) as e:
+        # Note: gzip.BadGzipFile is an OSError
+        print(f'[Error] extract archive failed: {e}')
+        return False
+    finally:
+        response.close()
+        shutil.rmtree(partial_dir, ignore_errors=True)
+
+
+def is_sparse_checkout_enabled():
+    return get_env_dict().get('sparse_checkout', 'false').strip(" '\"").lower() in ('1', 'true', 'yes')
+
+
+def add_sparse_checkout_paths(download_dir, source_paths):
+    """Check out the missing source files of a sparse checkout, the blobs are fetched on demand"""
+    missing_paths = [x for x in source_paths if not os.path.exists(os.path.join(download_dir, x))]
+    if len(missing_paths) == 0:
+        return
+
+    # Note: a full checkout isn't sparse, and the missing paths don't exist in the commit at all
+    process = subprocess.run(['git', '-C', download_dir, 'sparse-checkout', 'list'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        return
+
+    print(f'sparse checkout add: {missing_paths}')
+    git_cmd = ['git', '-C', download_dir, 'sparse-checkout', 'add'] + tool_get_sparse_checkout_patterns(missing_paths)
+    process = subprocess.run(git_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        print(f'[Error] `{" ".join(git_cmd)}` failed: {process.stderr.decode("utf-8", "replace").strip()}')
+
+
+def get_git_cache_dir(git_url):
+    git_url_hash = hashlib.sha1(git_url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(GIT_CACHE_DIR, f'{git_url_hash}.git')
+
+
+def get_git_cache_repo_lock(cache_dir):
+    with git_cache_lock:
+        return git_cache_repo_locks.setdefault(cache_dir, threading.Lock())
+
+
+def update_git_cache_index(git_url, cache_dir, worktree_dir=None):
+    """Record the last used time and the size of the git cache, then evict the least recently used ones
+
+    worktree_dir is the new checkout of the git url, a worktree of the bare repository or an extracted archive.
+    """
+    cache_name = os.path.basename(cache_dir)
+    # Note: measure out of git_cache_lock, only the new worktree and the bare repository, the sizes of
+    # the other worktrees are recorded when they're added
+    worktree_size = tool_get_dir_size(worktree_dir) if worktree_dir is not None else None
+    repo_size = tool_get_dir_size(cache_dir) if worktree_dir is not None else None
+
+    with git_cache_lock:
+        index = tool_load_json_file(GIT_CACHE_INDEX_FILE_PATH)
+        # Note: the checkout before the git cache is not in the index
+        if worktree_dir is None and cache_name not in index:
+            return
+
+        entry = index.setdefault(cache_name, {
+            'git_url': git_url,
+            'repo_size': 0,
+            'worktree_sizes': {},
+            'size': 0,
+        })
+        tool_upgrade_git_cache_entry(entry)
+        entry['last_used'] = time.time()
+        eviction_list = []
+        if worktree_dir is not None:
+            entry['repo_size'] = repo_size
+            entry['worktree_sizes'][worktree_dir] = worktree_size
+            entry['size'] = repo_size + sum(entry['worktree_sizes'].values())
+            eviction_list = pop_git_cache_evictions(index, cache_name)
+
+        tool_save_json_file(GIT_CACHE_INDEX_FILE_PATH, index)
+
+    # Note: remove the evicted caches out of git_cache_lock, their repository locks are held
+    for cache_name, entry, repo_lock in eviction_list:
+        try:
+            for worktree_dir in entry['worktree_sizes'].keys():
+                shutil.rmtree(worktree_dir, ignore_errors=True)
+                remove_source_map_entries(worktree_dir)
+            shutil.rmtree(os.path.join(GIT_CACHE_DIR, cache_name), ignore_errors=True)
+        finally:
+            repo_lock.release()
+        print(f'[show_source_code] evict git cache of {entry["git_url"]} ({entry["size"] // 1024 // 1024} MB)')
+
+
+def remove_source_map_entries(local_dir):
+    """Delete the saved entries mapped into local_dir, and drop them from the path resolver of this session"""
+    build_prefix_list = get_source_map_store().remove_local_dir(local_dir)
+    if '_show_source_code_path_resolver' in globals():
+        resolver = get_path_resolver()
+        for build_prefix in build_prefix_list:
+            resolver.remove_build_prefix(build_prefix)
+
+
+def pop_git_cache_evictions(index, keep_cache_name):
+    """Pop the least recently used caches over the size limit from the index. Return a list of (cache name, entry, repository lock)
+
+    Must be called with git_cache_lock held. The repository locks are acquired, the caller removes the caches and releases them.
+    """
+    # Note: configure `git_cache_max_size_mb` in the .env file, default is 2048
+    max_size = int(get_env_dict().get('git_cache_max_size_mb', '2048').strip(" '\"")) * 1024 * 1024
+    total_size = sum(x['size'] for x in index.values())
+
+    eviction_list = []
+    for cache_name, entry in sorted(index.items(), key=lambda x: x[1]['last_used']):
+        if total_size <= max_size:
+            break
+        if cache_name == keep_cache_name:
+            continue
+
+        # Note: skip the caches in use, another thread may be fetching into it or adding a worktree
+        repo_lock = git_cache_repo_locks.setdefault(os.path.join(GIT_CACHE_DIR, cache_name), threading.Lock())
+        if not repo_lock.acquire(blocking=False):
+            continue
+
+        tool_upgrade_git_cache_entry(entry)
+        total_size -= entry['size']
+        del index[cache_name]
+        eviction_list.append((cache_name, entry, repo_lock))
+
+    return eviction_list
+
+
+def resolve_pod_source(pod_name, pod_version, source_paths=None):
+    """Query the podspec and download the pod source. Return the local source code prefix, or None if failed"""
+    git_info = get_git_info_dict(pod_name, pod_version)
+    if git_info is None:
+        print(f'[Error] get git info failed for {pod_name} ({pod_version})')
+        return None
+    print(f"git_info: {git_info}")
+
+    download_dir = download_git_repo(git_info['git_url'], git_info['git_commit'], pod_name, pod_version, source_paths)
+    if download_dir is None:
+        return None
+
+    return os.path.join(download_dir, pod_name)
+
+
+def resolve_pod_source_async(pod_name, pod_version, source_paths=None):
+    """Run resolve_pod_source in the worker pool, the same pod version shares one in-flight download"""
+    key = (pod_name, pod_version)
+    with pod_download_lock:
+        # Note: join the in-flight download even if the source_paths differ, the missing
+        # files are added to the sparse checkout by the next mapping
+        future = pod_download_futures.get(key)
+        if future is not None:
+            return future
+        future = get_download_executor().submit(resolve_pod_source, pod_name, pod_version, source_paths)
+        pod_download_futures[key] = future
+
+    # Note: add the callback out of the lock, it runs immediately if the future is already done
+    future.add_done_callback(lambda x: tool_pop_download_future(key))
+    return future
+
+
+def get_download_executor():
+    if '_show_source_code_download_executor' not in globals():
+        # Note: configure `download_workers` in the .env file, default is 4
+        max_workers = int(get_env_dict().get('download_workers', '4').strip(" '\""))
+        globals()['_show_source_code_download_executor'] = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(max_workers, 1), thread_name_prefix='show_source_code')
+
+    return globals()['_show_source_code_download_executor']
+
+
+def tool_pop_download_future(key):
+    with pod_download_lock:
+        pod_download_futures.pop(key, None)
+
+
+def tool_get_source_map_command(map_dict):
+    map_string = ' '.join(f'{tool_quote_argument(k)} {tool_quote_argument(v)}' for k, v in map_dict.items())
+    return f'settings set target.source-map {map_string}'
+
+
+def tool_quote_argument(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def tool_get_repo_path(git_url):
+    """e.g. git@host:group/repo.git or https://host/group/repo.git -> group/repo"""
+    if '://' in git_url:
+        path = git_url.split('://', 1)[1].split('/', 1)[-1]
+    else:
+        path = git_url.split(':', 1)[-1]
+    path = path.strip('/')
+    return path[:-len('.git')] if path.endswith('.git') else path
+
+
+def tool_strip_tar_member(member, strip_count):
+    """Remove the leading strip_count components from the member path. Return False if nothing left"""
+    components = [x for x in member.name.split('/') if x and x != '.']
+    if len(components) <= strip_count:
+        return False
+    member.name = '/'.join(components[strip_count:])
+    if member.islnk():
+        # Note: the target of a hard link is also a path in the archive
+        link_components = [x for x in member.linkname.split('/') if x and x != '.']
+        member.linkname = '/'.join(link_components[strip_count:])
+    return True
+
+
+def tool_is_safe_tar_member(member):
+    """Only regular files, folders and links inside the extract folder"""
+    if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+        return False
+    if os.path.isabs(member.name) or '..' in member.name.split('/'):
+        return False
+    if member.issym():
+        link_path = os.path.normpath(os.path.join(os.path.dirname(member.name), member.linkname))
+        return not os.path.isabs(member.linkname) and link_path != '..' and not link_path.startswith('../')
+    if member.islnk():
+        return len(member.linkname) > 0 and not os.path.isabs(member.linkname) and '..' not in member.linkname.split('/')
+    return True
+
+
+def tool_get_sparse_checkout_patterns(source_paths):
+    # Note: the leading slash matches the single file from the repository root in non-cone mode
+    return ['/' + x.lstrip('/') for x in sorted(source_paths)]
+
+
+def tool_get_repo_relative_path(source_file_path, pod_info_dict):
+    """Get the path relative to the repository root, e.g. /build/x/PodName/Classes/a.m -> PodName/Classes/a.m"""
+    pod_build_prefix = pod_info_dict['pod_build_prefix']
+    return pod_info_dict['pod_name'] + source_file_path[len(pod_build_prefix):]
+
+
+def tool_upgrade_git_cache_entry(entry):
+    """The older index records the worktree list and the total size only, count the total size as the repository size"""
+    if 'worktree_sizes' not in entry:
+        entry['worktree_sizes'] = {x: 0 for x in entry.pop('worktrees', [])}
+        entry['repo_size'] = entry.get('size', 0)
+
+
+def tool_get_dir_size(dir_path):
+    size = 0
+    for root, dirs, files in os.walk(dir_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size
+
+
+def tool_load_json_file(file_path):
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def tool_save_json_file(file_path, content_dict):
+    atomic_file_writer.write_file_atomically(file_path, lambda f: f.write(json.dumps(content_dict)))
 
 
 def tool_get_value_by_key_path(data, key_path):
@@ -355,114 +985,274 @@ def target_source_map(source_info, executable_path, debugger):
             print(f'pod version query failed with pod name {pod_name}')
             return False
 
-        git_info = get_git_info_dict(pod_name, pod_version)
-        if git_info is None:
-            print(f'[Error] get git info failed: {git_info}')
+        source_paths = [tool_get_repo_relative_path(source_file_path, pod_info_dict)]
+        # Note: join the in-flight download of the same pod version, e.g. a background job or the prewarm
+        local_source_code_prefix = resolve_pod_source_async(pod_name, pod_version, source_paths).result()
+        if local_source_code_prefix is None:
             return False
-        print(f"git_info: {git_info}")
 
-        git_url = git_info['git_url']
-        git_commit = git_info['git_commit']
+        return apply_source_map({pod_build_prefix: local_source_code_prefix}, debugger)
 
-        local_source_code_prefix = os.path.join(download_git_repo(git_url, git_commit, pod_name, pod_version), pod_name)
-        new_map_line = f'{pod_build_prefix} {local_source_code_prefix}'
 
-        source_map_file_path = os.path.join('/tmp/show_source_code', 'source_map.txt')
-        lines = get_saved_map_lines(source_map_file_path, local_source_code_prefix)
-        print(f'saved map lines: {lines}')
+def target_source_map_batch(source_file_path_list, executable_path, debugger):
+    """Map all source files in one pass: group them by pod, resolve every pod once and set target.source-map once"""
+    # Note: the saved entries may be not in lldb any more, e.g. after `settings clear target.source-map` or in a new target,
+    # only skip the files mapped by the current target.source-map
+    existing_map_dict = get_existing_map_dict(debugger)
+    pod_build_prefix_dict, pod_source_paths_dict, failed_path_list = group_source_files_by_pod(source_file_path_list, existing_map_dict)
+    for source_file_path in failed_path_list:
+        print(f'[Error] mapping {source_file_path} failed')
+    has_one_failed = len(failed_path_list) > 0
 
-        lines.append(new_map_line)
-        lines = merge_existing_map_lines(lines)
+    if len(pod_build_prefix_dict) == 0:
+        print('[show_source_code] No binary need to debug. Source code is already available.')
+        return not has_one_failed
+
+    print(f'pods to map: {sorted(pod_build_prefix_dict.keys())}')
+    pod_version_dict = get_local_pod_version_dict(executable_path) or {}
+    # Note: warm the podspec cache in one batch, so the download workers don't query the server one by one
+    get_podspec_dict_batch([(x, pod_version_dict[x]) for x in pod_build_prefix_dict.keys() if x in pod_version_dict])
+    # Note: download the pods concurrently, and handle every pod as soon as it's ready
+    future_dict = {}
+    for pod_name in pod_build_prefix_dict.keys():
+        pod_version = pod_version_dict.get(pod_name)
+        if pod_version is None:
+            print(f'[Error] pod version query failed with pod name {pod_name}')
+            has_one_failed = True
+            continue
+        future_dict[resolve_pod_source_async(pod_name, pod_version, pod_source_paths_dict[pod_name])] = pod_name
+
+    new_map_dict = OrderedDict()
+    for index, future in enumerate(concurrent.futures.as_completed(future_dict)):
+        pod_name = future_dict[future]
+        try:
+            local_source_code_prefix = future.result()
+        except Exception as e:
+            print(f'[Error] resolve {pod_name} failed: {e}')
+            local_source_code_prefix = None
+        if local_source_code_prefix is None:
+            print(f'[{index + 1}/{len(future_dict)}] {pod_name} failed')
+            has_one_failed = True
+            continue
 
-        map_string = ' '.join(lines)
-        source_map_cmd = f'settings set target.source-map {map_string}'
-        print(f'execute: {source_map_cmd}')
-        print('Starting translate into source code...')
-        res_of_source_map = lldb.SBCommandReturnObject()
-        debugger.GetCommandInterpreter().HandleCommand(source_map_cmd, res_of_source_map)
-        if res_of_source_map.Succeeded():
-            with open(source_map_file_path, "w") as f:
-                f.write('\n'.join(lines))
-                f.close()
+        print(f'[{index + 1}/{len(future_dict)}] {pod_name} ready: {local_source_code_prefix}')
+        for pod_build_prefix in sorted(pod_build_prefix_dict[pod_name]):
+            new_map_dict[pod_build_prefix] = local_source_code_prefix
 
-            print('Done!🍺🍺🍺')
-            return True
-        else:
-            print(f'Failed!{res_of_source_map.GetError()}')
-            return False
+    if len(new_map_dict) == 0:
+        return False
+
+    return apply_source_map(new_map_dict, debugger) and not has_one_failed
+
+
+def group_source_files_by_pod(source_file_path_list, existing_map_dict=None):
+    """Group the source files which need mapping. Return (pod name -> set of pod build prefixes,
+    pod name -> set of repository relative paths, list of the paths without pod info)
+
+    existing_map_dict: skip the files mapped by these entries, or by the saved entries if None
+    """
+    pod_build_prefix_dict = {}
+    pod_source_paths_dict = {}
+    failed_path_list = []
+    resolver = get_path_resolver()
+    if existing_map_dict is None:
+        local_file_path_dict = resolver.resolve_batch(source_file_path_list)
+    else:
+        existing_map_resolver = source_path_resolver.SourcePathResolver()
+        existing_map_resolver.add_map_dict(existing_map_dict)
+        local_file_path_dict = existing_map_resolver.resolve_batch(source_file_path_list)
+    for source_file_path, local_file_path in local_file_path_dict.items():
+        if os.path.isfile(source_file_path) or (local_file_path and os.path.isfile(local_file_path)):
+            continue
+        pod_info_dict = resolver.get_pod_info(source_file_path)
+        if pod_info_dict is None:
+            failed_path_list.append(source_file_path)
+            continue
+        pod_build_prefix_dict.setdefault(pod_info_dict['pod_name'], set()).add(pod_info_dict['pod_build_prefix'])
+        # Note: the repository relative paths are for the sparse checkout
+        pod_source_paths_dict.setdefault(pod_info_dict['pod_name'], set()).add(tool_get_repo_relative_path(source_file_path, pod_info_dict))
 
+    return pod_build_prefix_dict, pod_source_paths_dict, failed_path_list
 
-def merge_existing_map_lines(lines):
-    """Merge the existing map lines before execute settings set command"""
+
+def apply_source_map(new_map_dict, debugger):
+    """Merge the new entries with the saved and existing ones, then set target.source-map once"""
+    store = get_source_map_store()
+    saved_map_dict = store.get_valid_map_dict()
+    print(f'saved map entries: {len(saved_map_dict)}')
+
+    # Note: always make existing map entries order first, the later ones replace the same build prefix
+    map_dict = get_existing_map_dict(debugger)
+    map_dict.update(saved_map_dict)
+    map_dict.update(new_map_dict)
+
+    source_map_cmd = tool_get_source_map_command(map_dict)
+    print(f'execute: {source_map_cmd}')
+    print('Starting translate into source code...')
+    res_of_source_map = lldb.SBCommandReturnObject()
+    debugger.GetCommandInterpreter().HandleCommand(source_map_cmd, res_of_source_map)
+    if res_of_source_map.Succeeded():
+        # Note: only write the changed entries
+        store.add({k: v for k, v in map_dict.items() if saved_map_dict.get(k) != v})
+        get_path_resolver().add_map_dict(map_dict)
+        print('Done!🍺🍺🍺')
+        return True
+    else:
+        print(f'Failed!{res_of_source_map.GetError()}')
+        return False
+
+
+def get_existing_map_dict(debugger=None):
+    """Get the current target.source-map entries as an ordered dictionary of build prefix -> local prefix"""
+    map_dict = OrderedDict()
     res = lldb.SBCommandReturnObject()
-    debugger = lldb.debugger
+    # Note: lldb.debugger is only available in the command, not in the background jobs
+    debugger = debugger or lldb.debugger
     interpreter = debugger.GetCommandInterpreter()
     interpreter.HandleCommand(f'settings show target.source-map', res)
     if res.Succeeded():
         # target.source-map (path-map) =
         # [0] "/Users/path1" -> "/Users/path2"
-        previous_map_string = res.GetOutput()
-        # print(f'previous lines: {previous_map_string}')
-
-        previous_map_string = previous_map_string.replace('target.source-map (path-map) =', '')
-        components = previous_map_string.split('\n')
-        seen_set = set()
-        for component in components:
-            line = component.strip(' \n')
-            line = re.sub(r"^\[\d+\]\s*", "", line)
-            line = line.replace('" -> "', ' ')
-            line = line.strip(' \"\n')
-            # print(f'tidy line: {line}')
-            if len(line) == 0 or line in seen_set or line in lines:
-                continue
-            seen_set.add(line)
-            # Note: always make existing map lines order first
-            lines.insert(0, line)
-    return lines
+        for line in res.GetOutput().split('\n'):
+            match = re.match(r'^\s*\[\d+\]\s*"(.*)" -> "(.*)"\s*$', line)
+            if match:
+                map_dict.setdefault(match.group(1), match.group(2))
+    return map_dict
 
 
-def process_all_frame_map(executable_path, debugger):
-    hasOneFailed = False
+def get_source_map_store():
+    if '_show_source_code_source_map_store' not in globals():
+        globals()['_show_source_code_source_map_store'] = source_map_store.SourceMapStore()
 
+    return globals()['_show_source_code_source_map_store']
+
+
+def process_all_frame_map(executable_path, debugger, background=False):
+    source_file_path_list = []
     for thread in lldb.debugger.GetSelectedTarget().GetProcess():
-        lineEntries = lldbutil.get_file_specs(thread)
-        for lineEntry in lineEntries:
-            if lineEntry.GetDirectory() is not None and lineEntry.GetFilename() is not None:
-                path = lineEntry.GetDirectory() + "/" + lineEntry.GetFilename()
-                success = target_source_map(path, executable_path, debugger)
-                print(f'[Error] mapping {path} failed') if success is False else None
-                if not hasOneFailed and not success:
-                    hasOneFailed = not success
-
-    if not hasOneFailed:
-        print('Done!🍺🍺🍺')
+        source_file_path_list.extend(get_thread_source_file_paths(thread))
 
+    run_source_map_batch(source_file_path_list, executable_path, debugger, background)
 
-def thread_all_frame_map(executable_path, debugger):
-    hasOneFailed = False
 
+def thread_all_frame_map(executable_path, debugger, background=False):
     thread = lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread()
+    source_file_path_list = get_thread_source_file_paths(thread)
+
+    run_source_map_batch(source_file_path_list, executable_path, debugger, background)
+
+
+def run_source_map_batch(source_file_path_list, executable_path, debugger, background):
+    # Note: the frames are collected before, only the mapping runs in background
+    if background:
+        description = f'map {len(set(source_file_path_list))} source files'
+        start_background_job(description, target_source_map_batch, source_file_path_list, executable_path, debugger)
+        return
+
+    success = target_source_map_batch(source_file_path_list, executable_path, debugger)
+    print('[Error] mapping some frames failed') if success is False else None
+
+
+def get_thread_source_file_paths(thread):
+    source_file_path_list = []
     lineEntries = lldbutil.get_file_specs(thread)
     for lineEntry in lineEntries:
         if lineEntry.GetDirectory() is not None and lineEntry.GetFilename() is not None:
-            path = lineEntry.GetDirectory() + "/" + lineEntry.GetFilename()
-            success = target_source_map(path, executable_path, debugger)
-            print(f'[Error] mapping {path} failed') if success is False else None
-            if not hasOneFailed and not success:
-                hasOneFailed = not success
+            source_file_path_list.append(lineEntry.GetDirectory() + "/" + lineEntry.GetFilename())
+    return source_file_path_list
+
+
+def prewarm_modules(target, modules):
+    """Query the podspecs and download the pod sources of the compile units in the modules. Return True if all succeed"""
+    source_file_path_list = []
+    for module in modules:
+        for index in range(module.GetNumCompileUnits()):
+            file_spec = module.GetCompileUnitAtIndex(index).GetFileSpec()
+            if file_spec.GetDirectory() is not None and file_spec.GetFilename() is not None:
+                source_file_path_list.append(file_spec.GetDirectory() + "/" + file_spec.GetFilename())
+
+    # Note: the compile units out of the pods are not errors here
+    pod_build_prefix_dict, pod_source_paths_dict, _ = group_source_files_by_pod(source_file_path_list)
+    if len(pod_source_paths_dict) == 0:
+        return True
 
-    if not hasOneFailed:
-        print('Done!🍺🍺🍺')
+    executable_path = target.GetExecutable().GetDirectory()
+    pod_version_dict = get_local_pod_version_dict(executable_path) or {}
+    pod_version_list = [(x, pod_version_dict[x]) for x in sorted(pod_source_paths_dict.keys()) if x in pod_version_dict]
+    print(f'[show_source_code] prewarm {len(pod_version_list)} pods of {len(source_file_path_list)} compile units')
+    get_podspec_dict_batch(pod_version_list)
+
+    future_list = [resolve_pod_source_async(x, y, pod_source_paths_dict[x]) for x, y in pod_version_list]
+    has_one_failed = False
+    for future in concurrent.futures.as_completed(future_list):
+        try:
+            has_one_failed = future.result() is None or has_one_failed
+        except Exception as e:
+            print(f'[Error] prewarm failed: {e}')
+            has_one_failed = True
+
+    return not has_one_failed
+
+
+def get_unprewarmed_modules(target):
+    """Get the modules of the target which are not prewarmed, and mark them prewarmed"""
+    modules = []
+    with prewarm_lock:
+        for index in range(target.GetNumModules()):
+            module = target.GetModuleAtIndex(index)
+            key = module.GetUUIDString() or str(module.GetFileSpec())
+            if key in prewarmed_module_keys:
+                continue
+            prewarmed_module_keys.add(key)
+            modules.append(module)
+
+    return modules
+
+
+def start_prewarm_job(target):
+    """Prewarm the modules not prewarmed in background. Return False if no such modules"""
+    modules = get_unprewarmed_modules(target)
+    if len(modules) == 0:
+        return False
+    start_background_job(f'prewarm {len(modules)} modules of {target.GetExecutable().GetFilename()}', prewarm_modules, target, modules)
+    return True
+
+
+def start_prewarm_listener(debugger):
+    """Prewarm the pod sources when the modules of any target are loaded"""
+    if '_show_source_code_prewarm_listener' in globals():
+        return
+
+    listener = lldb.SBListener('show_source_code.prewarm')
+    listener.StartListeningForEventClass(debugger, lldb.SBTarget.GetBroadcasterClassName(), lldb.SBTarget.eBroadcastBitModulesLoaded)
+    globals()['_show_source_code_prewarm_listener'] = listener
+
+    def run_listener():
+        event = lldb.SBEvent()
+        while True:
+            if not listener.WaitForEvent(1, event) or not lldb.SBTarget.EventIsTargetEvent(event):
+                continue
+            target = lldb.SBTarget.GetTargetFromEvent(event)
+            # Note: the modules are loaded one by one when the process launches, handle the queued events together
+            while listener.GetNextEvent(event):
+                pass
+            if target.IsValid():
+                start_prewarm_job(target)
+
+    threading.Thread(target=run_listener, name='show_source_code_prewarm_listener', daemon=True).start()
+
+
+def is_prewarm_on_target_load_enabled():
+    # Note: configure `prewarm_on_target_load` in the .env file, default is false
+    return get_env_dict().get('prewarm_on_target_load', 'false').strip(" '\"").lower() in ('1', 'true', 'yes')
 
 
 def preload_map_info_on_lldb_start(debugger):
-    source_map_file_path = os.path.join('/tmp/show_source_code', 'source_map.txt')
-    lines = get_saved_map_lines(source_map_file_path, '')
-    if len(lines) == 0:
-        return 
-    print(f'lines: {lines}')
-    map_string = ' '.join(lines)
-    source_map_cmd = f'settings set target.source-map {map_string}'
+    map_dict = get_source_map_store().get_valid_map_dict()
+    if len(map_dict) == 0:
+        return
+    print(f'saved map entries: {len(map_dict)}')
+    source_map_cmd = tool_get_source_map_command(map_dict)
     print(f'execute: {source_map_cmd}')
     debugger.HandleCommand(source_map_cmd)
 
@@ -476,4 +1266,6 @@ def __lldb_init_module(debugger, internal_dict):
     print(f'The "{command_name}" command has been installed and is ready for use.')
 
     preload_map_info_on_lldb_start(debugger)
+    if is_prewarm_on_target_load_enabled():
+        start_prewarm_listener(debugger)
 
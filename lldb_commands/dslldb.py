@@ -22,23 +22,17 @@
 
 import lldb
 import os
+import sys
+
+# Note: the shared loader helper lives in the parent folder, e.g. ~/lldb_scripts
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import lldb_script_loader
 
 def __lldb_init_module(debugger, internal_dict):
+    lldb_script_loader.register_session_module(internal_dict)
     file_path = os.path.realpath(__file__)
     dir_name = os.path.dirname(file_path)
     load_python_scripts_dir(dir_name)
 
 def load_python_scripts_dir(dir_name):
-    this_files_basename = os.path.basename(__file__)
-    cmd = ''
-    for file in os.listdir(dir_name):
-        if file.endswith('.py'):
-            cmd = 'command script import ' 
-        elif file.endswith('.txt'):
-            cmd = 'command source -e0 -s1 '
-        else: 
-            continue
-
-        if file != this_files_basename:
-            fullpath = dir_name + '/' + file
-            lldb.debugger.HandleCommand(cmd + fullpath)
+    lldb_script_loader.load_scripts_dir(lldb.debugger, dir_name)
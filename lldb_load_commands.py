@@ -11,26 +11,16 @@
 
 import lldb
 import os
+import lldb_script_loader
 
 
 def __lldb_init_module(debugger, internal_dict):
+    lldb_script_loader.register_session_module(internal_dict)
     file_path = os.path.realpath(__file__)
     dir_name = os.path.dirname(file_path)
     load_python_scripts_dir(dir_name)
 
 
 def load_python_scripts_dir(dir_name):
-    this_files_basename = os.path.basename(__file__)
-    cmd = ''
-    for file in os.listdir(dir_name):
-        if file.endswith('.py') and file.startswith('lldb_command_'):
-            cmd = 'command script import '
-        elif file.endswith('.txt'):
-            # Note: remove -e0 -s1 to show error message
-            cmd = 'command source -e0 -s1 '
-        else:
-            continue
-
-        if file != this_files_basename:
-            fullpath = dir_name + '/' + file
-            lldb.debugger.HandleCommand(cmd + fullpath)
+    # Note: load the `.txt` files and the python scripts with prefix `lldb_command_`
+    lldb_script_loader.load_scripts_dir(lldb.debugger, dir_name, 'lldb_command_')
@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+##
+# The shared helper for the script loaders, lldb_load_commands.py and lldb_commands/dslldb.py
+#
+# Lazy mode:
+# put the following line in the .env file next to this script
+#
+# lazy_load = true
+#
+# and the loaders only register a lightweight stub for every command. The real script
+# is imported the first time one of its commands runs.
+#
+# The commands of every script are read from the manifest, see lldb_script_manifest.py
+#
+# Timing report:
+# put `loader_stats = true` in the .env file, then run `loader_stats` in lldb to list the
+# time of every import, registration and `command source` line sorted
+
+import lldb
+import argparse
+import json
+import os
+import shlex
+import sys
+import time
+import lldb_script_manifest
+
+## Loader stat stages
+STAGE_MANIFEST = 'manifest'
+STAGE_IMPORT = 'import'
+STAGE_REGISTER = 'register'
+STAGE_SOURCE = 'source'
+STAGE_SOURCE_LINE = 'source_line'
+STAGE_LAZY_IMPORT = 'lazy_import'
+
+# Note: command name -> script info dictionary with keys: path、module、commands、loaded
+_lazy_commands = {}
+# Note: the timing records with keys: file、stage、seconds、command
+_loader_stats = []
+# Note: folder path -> dictionary with keys: prefix、scripts, the scripts are the manifest entries when loaded
+_loaded_dirs = {}
+
+
+def register_session_module(internal_dict):
+    """Make this module visible in the lldb session, so `-f lldb_script_loader.xxx` can be resolved"""
+    internal_dict[__name__] = sys.modules[__name__]
+
+
+def get_loader_env_dict():
+    if '_lldb_script_loader_env' in globals():
+        return globals()['_lldb_script_loader_env']
+
+    env_file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.env')
+    props = {}
+
+    # Note: the .env file is optional for the loaders
+    if os.path.isfile(env_file_path):
+        with open(env_file_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+
+                if "=" not in line: continue
+                if line.startswith("#"): continue
+
+                k, v = line.split("=", 1)
+                props[k.strip().lower()] = v.strip(" '\"")
+    globals()['_lldb_script_loader_env'] = props
+
+    return props
+
+
+def is_env_flag_enabled(key):
+    return get_loader_env_dict().get(key, '').lower() in ('1', 'true', 'yes')
+
+
+def is_lazy_load_enabled():
+    return is_env_flag_enabled('lazy_load')
+
+
+def is_loader_stats_enabled():
+    return is_env_flag_enabled('loader_stats')
+
+
+def load_scripts_dir(debugger, dir_name, prefix=''):
+    """Load the `.txt` files and the `.py` files which start with prefix in the folder by the manifest"""
+    add_loader_commands(debugger)
+    stats_enabled = is_loader_stats_enabled()
+    lazy_load = is_lazy_load_enabled()
+
+    start_time = time.perf_counter()
+    manifest = lldb_script_manifest.update_manifest(dir_name, prefix)
+    add_loader_stat(dir_name, STAGE_MANIFEST, time.perf_counter() - start_time) if stats_enabled else None
+
+    for file_name, script in manifest['scripts'].items():
+        load_script(debugger, os.path.join(dir_name, file_name), script, lazy_load, stats_enabled)
+
+    _loaded_dirs[dir_name] = {
+        'prefix': prefix,
+        'scripts': manifest['scripts'],
+    }
+
+
+def load_script(debugger, file_path, script, lazy_load, stats_enabled):
+    """Load the script by the manifest entry, see lldb_script_manifest.scan_script"""
+    start_time = time.perf_counter()
+    if script['kind'] == lldb_script_manifest.KIND_SOURCE:
+        if stats_enabled:
+            source_file_with_stats(debugger, file_path)
+        else:
+            # Note: remove -e0 -s1 to show error message
+            debugger.HandleCommand(f'command source -e0 -s1 {file_path}')
+        stage = STAGE_SOURCE
+    elif lazy_load and script['lazy']:
+        register_lazy_script(debugger, file_path, script['commands'])
+        stage = STAGE_REGISTER
+    else:
+        debugger.HandleCommand(f'command script import {file_path}')
+        stage = STAGE_IMPORT
+    add_loader_stat(file_path, stage, time.perf_counter() - start_time) if stats_enabled else None
+
+
+def unload_script(debugger, script):
+    """Delete the commands of the manifest entry"""
+    res = lldb.SBCommandReturnObject()
+    interpreter = debugger.GetCommandInterpreter()
+    for command in script['commands']:
+        command_name = command['name']
+        _lazy_commands.pop(command_name, None)
+        if script['kind'] == lldb_script_manifest.KIND_SOURCE:
+            # Note: `command alias` makes an alias, `command regex` makes a user command
+            interpreter.HandleCommand(f'command unalias {command_name}', res)
+            interpreter.HandleCommand(f'command delete {command_name}', res)
+        else:
+            interpreter.HandleCommand(f'command script delete {command_name}', res)
+
+
+def source_file_with_stats(debugger, file_path):
+    """Same as `command source -e0 -s1`, but run the file line by line to time every command"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    res = lldb.SBCommandReturnObject()
+    interpreter = debugger.GetCommandInterpreter()
+    for line in lines:
+        line = line.strip()
+        if len(line) == 0 or line.startswith('#'):
+            continue
+        start_time = time.perf_counter()
+        interpreter.HandleCommand(line, res)
+        add_loader_stat(file_path, STAGE_SOURCE_LINE, time.perf_counter() - start_time, line)
+
+
+def add_loader_stat(file_path, stage, seconds, command=None):
+    _loader_stats.append({
+        'file': file_path,
+        'stage': stage,
+        'seconds': seconds,
+        'command': command,
+    })
+
+
+def add_loader_commands(debugger):
+    res = lldb.SBCommandReturnObject()
+    interpreter = debugger.GetCommandInterpreter()
+    # Note: both loaders call this, keep the latest one
+    interpreter.HandleCommand('command script delete loader_stats', res)
+    interpreter.HandleCommand(f'command script add -f {__name__}.loader_stats -h "Show the timing of the script loaders" loader_stats', res)
+    interpreter.HandleCommand('command script delete reload_scripts', res)
+    interpreter.HandleCommand(f'command script add -f {__name__}.reload_scripts -h "Reload the changed lldb scripts only" reload_scripts', res)
+
+
+def loader_stats(debugger, command, result, internal_dict):
+    parser = argparse.ArgumentParser(
+        prog='loader_stats',
+        description='Show the import, registration and `command source` time of the script loaders')
+    parser.add_argument('-n', '--number', type=int, default=None, help='only show the slowest N records')
+    parser.add_argument('-j', '--json-output-file', help='dump all records into the JSON file')
+
+    try:
+        options = parser.parse_args(shlex.split(command))
+    except SystemExit:
+        return
+
+    if len(_loader_stats) == 0:
+        print('[loader_stats] no records. Add `loader_stats = true` to the .env file and restart lldb')
+        return
+
+    if options.json_output_file:
+        with open(os.path.expanduser(options.json_output_file), 'w') as f:
+            f.write(json.dumps(_loader_stats, indent=2, ensure_ascii=False))
+        print(f'[loader_stats] write {len(_loader_stats)} records to {options.json_output_file}')
+        return
+
+    records = sorted(_loader_stats, key=lambda x: x['seconds'], reverse=True)
+    records = records[:options.number] if options.number else records
+    # Note: the source_line records are already included by their source records
+    total = sum(x['seconds'] for x in _loader_stats if x['stage'] != STAGE_SOURCE_LINE)
+    print(f'[loader_stats] total: {total * 1000:.1f} ms')
+    for x in records:
+        name = x['command'][:80] if x['command'] else x['file']
+        print(f'{x["seconds"] * 1000:10.1f} ms  {x["stage"]:<12} {name}')
+
+
+def reload_scripts(debugger, command, result, internal_dict):
+    """Reload the scripts changed since the last load, and only register their commands again"""
+    stats_enabled = is_loader_stats_enabled()
+    lazy_load = is_lazy_load_enabled()
+    reloaded_count = 0
+
+    for dir_name, loaded_info in _loaded_dirs.items():
+        manifest = lldb_script_manifest.update_manifest(dir_name, loaded_info['prefix'])
+        loaded_scripts = loaded_info['scripts']
+
+        for file_name, script in manifest['scripts'].items():
+            loaded_script = loaded_scripts.get(file_name)
+            if loaded_script is not None and loaded_script['sha1'] == script['sha1']:
+                continue
+
+            file_path = os.path.join(dir_name, file_name)
+            unload_script(debugger, loaded_script) if loaded_script else None
+            load_script(debugger, file_path, script, lazy_load, stats_enabled)
+            print(f'[reload_scripts] reload {file_path}')
+            reloaded_count += 1
+
+        for file_name, loaded_script in loaded_scripts.items():
+            if file_name not in manifest['scripts']:
+                unload_script(debugger, loaded_script)
+                print(f'[reload_scripts] remove {os.path.join(dir_name, file_name)}')
+                reloaded_count += 1
+
+        loaded_info['scripts'] = manifest['scripts']
+
+    print(f'[reload_scripts] {reloaded_count} script(s) changed')
+
+
+def register_lazy_script(debugger, file_path, commands):
+    """Register a stub for every command of the script instead of importing it"""
+    script_info = {
+        'path': file_path,
+        'module': os.path.splitext(os.path.basename(file_path))[0],
+        'commands': commands,
+        'loaded': False,
+    }
+    for command in commands:
+        add_lazy_stub(debugger, command, script_info)
+
+
+def add_lazy_stub(debugger, command, script_info):
+    command_name = command['name']
+    stub_name = f'_lazy_stub_{command_name}'
+    globals()[stub_name] = tool_make_lazy_stub(command_name)
+    _lazy_commands[command_name] = script_info
+
+    res = lldb.SBCommandReturnObject()
+    interpreter = debugger.GetCommandInterpreter()
+    # Note: remove the previous command silently, e.g. run reload_lldbinit twice
+    interpreter.HandleCommand(f'command script delete {command_name}', res)
+    help_option = f' -h {tool_quote_argument(command["help"])}' if command['help'] else ''
+    interpreter.HandleCommand(f'command script add -f {__name__}.{stub_name}{help_option} {command_name}', res)
+    if not res.Succeeded():
+        print(f'[Error] register lazy command `{command_name}` failed: {res.GetError()}')
+
+
+def load_lazy_script(debugger, command_name):
+    """Replace the stubs of the script with the real commands. Return the error message if failed"""
+    script_info = _lazy_commands[command_name]
+    if script_info['loaded']:
+        return f'`{command_name}` is not registered by {script_info["path"]}'
+
+    res = lldb.SBCommandReturnObject()
+    interpreter = debugger.GetCommandInterpreter()
+    for command in script_info['commands']:
+        interpreter.HandleCommand(f'command script delete {command["name"]}', res)
+    start_time = time.perf_counter()
+    interpreter.HandleCommand(f'command script import {script_info["path"]}', res)
+    add_loader_stat(script_info['path'], STAGE_LAZY_IMPORT, time.perf_counter() - start_time) if is_loader_stats_enabled() else None
+    script_info['loaded'] = True
+
+    return None if res.Succeeded() else res.GetError()
+
+
+def tool_make_lazy_stub(command_name):
+    def lazy_stub(debugger, command, result, internal_dict):
+        error = load_lazy_script(debugger, command_name)
+        if error:
+            result.SetError(f'[lazy_load] {error}')
+            return
+        debugger.GetCommandInterpreter().HandleCommand(f'{command_name} {command}', result)
+
+    return lazy_stub
+
+
+def tool_quote_argument(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
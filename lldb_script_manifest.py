@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# The command manifest for the script loaders
+#
+# The manifest lists every script in the folder with the commands it defines, e.g.
+# command name -> module -> function/class and the help text. It's saved in
+# /tmp/lldb_scripts and only rescanned for the scripts whose mtime or content hash changed.
+#
+# Usage:
+# python3 lldb_script_manifest.py -d ~/lldb_scripts -p lldb_command_ > commands.json
+# python3 lldb_script_manifest.py -d ~/lldb_scripts/lldb_commands > commands.json
+#
+# and diff the command set across releases with the output JSON files.
+
+import argparse
+import ast
+import atomic_file_writer
+import hashlib
+import json
+import os
+import re
+import shlex
+import sys
+
+MANIFEST_DIR = '/tmp/lldb_scripts'
+# Note: increase the version when the scanner changes, so the old manifest is rebuilt
+MANIFEST_VERSION = 2
+# Note: the loaders import the other scripts, never load themselves
+LOADER_FILE_NAMES = ['dslldb.py', 'lldb_load_commands.py']
+
+## Script kinds
+KIND_SCRIPT = 'script'
+KIND_SOURCE = 'source'
+
+
+def update_manifest(dir_name, prefix='', excluded_file_names=LOADER_FILE_NAMES):
+    """Load the manifest of the folder and rescan the changed scripts
+
+    The scripts are the `.txt` files and the `.py` files which start with prefix.
+    """
+    manifest_file_path = get_manifest_file_path(dir_name)
+    manifest = load_manifest(manifest_file_path)
+    excluded_file_names = sorted(excluded_file_names)
+    dir_mtime_ns = os.stat(dir_name).st_mtime_ns
+    changed = False
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('prefix') != prefix or manifest.get('excluded') != excluded_file_names:
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'prefix': prefix,
+            'excluded': excluded_file_names,
+            'dir_mtime_ns': None,
+            'scripts': {},
+        }
+        changed = True
+
+    # Note: the folder mtime only changes when a file is added, removed or renamed
+    if manifest['dir_mtime_ns'] == dir_mtime_ns:
+        file_name_list = list(manifest['scripts'].keys())
+    else:
+        file_name_list = [x for x in os.listdir(dir_name) if tool_is_script_file(x, prefix, excluded_file_names)]
+        manifest['dir_mtime_ns'] = dir_mtime_ns
+        changed = True
+
+    scripts = {}
+    for file_name in sorted(file_name_list):
+        file_path = os.path.join(dir_name, file_name)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            changed = True
+            continue
+
+        script = manifest['scripts'].get(file_name)
+        if script is None or script['mtime_ns'] != stat.st_mtime_ns or script['size'] != stat.st_size:
+            sha1 = tool_file_sha1(file_path)
+            if script is None or script['sha1'] != sha1:
+                script = scan_script(file_path)
+                script['sha1'] = sha1
+            script['mtime_ns'] = stat.st_mtime_ns
+            script['size'] = stat.st_size
+            changed = True
+        scripts[file_name] = script
+
+    manifest['scripts'] = scripts
+    if changed:
+        save_manifest(manifest_file_path, manifest)
+
+    return manifest
+
+
+def get_manifest_file_path(dir_name):
+    # Note: keep the manifest out of the script folder, otherwise writing it changes the folder mtime
+    dir_hash = hashlib.sha1(os.path.realpath(dir_name).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(MANIFEST_DIR, f'manifest-{os.path.basename(dir_name)}-{dir_hash}.json')
+
+
+def load_manifest(manifest_file_path):
+    try:
+        with open(manifest_file_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest_file_path, manifest):
+    try:
+        atomic_file_writer.write_file_atomically(
+            manifest_file_path, lambda f: json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False))
+    except OSError:
+        # Note: the manifest is only a cache, just rebuild it next time
+        pass
+
+
+def get_command_dict(manifest):
+    """Get the command set with key: command name, value: dictionary with keys: file、function、help"""
+    command_dict = {}
+    for file_name, script in manifest['scripts'].items():
+        for command in script['commands']:
+            command_dict[command['name']] = {
+                'file': file_name,
+                'function': command['function'],
+                'help': command['help'],
+            }
+    return command_dict
+
+
+def scan_script(file_path):
+    """Scan the script into a dictionary with keys: kind、lazy、commands"""
+    if file_path.endswith('.txt'):
+        return {
+            'kind': KIND_SOURCE,
+            'lazy': False,
+            'commands': scan_source_commands(file_path),
+        }
+
+    commands, lazy = scan_script_commands(file_path)
+    return {
+        'kind': KIND_SCRIPT,
+        'lazy': lazy,
+        'commands': commands,
+    }
+
+
+def scan_script_commands(file_path):
+    """Statically collect the commands registered by `__lldb_init_module` of the script
+
+    Return a tuple of the command list and a bool. The command is a dictionary with
+    keys: name、function、help. The bool is False when `__lldb_init_module` does anything
+    else than `command script add`, so the script must be imported eagerly.
+    """
+    module_name = os.path.splitext(os.path.basename(file_path))[0]
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=file_path)
+    except (OSError, SyntaxError, ValueError):
+        return [], False
+
+    init_function = None
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == '__lldb_init_module':
+            init_function = node
+    if init_function is None:
+        return [], False
+
+    names = {}
+    commands = []
+    lazy = True
+    for statement in init_function.body:
+        # Note: skip the docstring
+        if isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant):
+            continue
+
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+            value = tool_evaluate_string_node(statement.value, names, module_name)
+            if value is None:
+                lazy = False
+            else:
+                names[statement.targets[0].id] = value
+            continue
+
+        if isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call):
+            call = statement.value
+            if isinstance(call.func, ast.Name) and call.func.id == 'print':
+                continue
+            command = tool_parse_handle_command_call(call, names, module_name)
+            if command is not None:
+                commands.append(command)
+                continue
+
+        # Note: still collect the commands for the manifest, e.g. the commands in if statement
+        lazy = False
+        for node in ast.walk(statement):
+            command = tool_parse_handle_command_call(node, names, module_name)
+            if command is not None:
+                commands.append(command)
+
+    return commands, lazy and len(commands) > 0
+
+
+def scan_source_commands(file_path):
+    """Collect the `command alias` and `command regex` in the file sourced by `command source`"""
+    commands = []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except (OSError, ValueError):
+        return commands
+
+    for line in lines:
+        match = re.match(r'^\s*command\s+(alias|regex)\s+(.*)$', line)
+        if match is None:
+            continue
+
+        # Note: the name is the first token which is not an option,
+        # e.g. command regex -h "help" -s "syntax" -- name 's/(.+)/xxx/'
+        rest = match.group(2)
+        help_text = ''
+        while rest.startswith('-'):
+            if rest.startswith('-- '):
+                rest = rest[len('-- '):].lstrip()
+                break
+            option_match = re.match(r'^(-\w)\s+("(?:[^"\\]|\\.)*"|\S+)\s+', rest)
+            if option_match is None:
+                break
+            if option_match.group(1) == '-h':
+                help_text = option_match.group(2).strip('"')
+            rest = rest[option_match.end():]
+
+        name = rest.split(' ')[0].strip()
+        if re.match(r'^\w+$', name):
+            commands.append({
+                'name': name,
+                'function': None,
+                'help': help_text,
+            })
+
+    return commands
+
+
+def tool_parse_handle_command_call(node, names, module_name):
+    """Parse `debugger.HandleCommand('command script add ...')` into a command dictionary"""
+    if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+        return None
+    if node.func.attr != 'HandleCommand' or len(node.args) != 1:
+        return None
+    command_string = tool_evaluate_string_node(node.args[0], names, module_name)
+    return tool_parse_command_script_add(command_string) if command_string else None
+
+
+def tool_evaluate_string_node(node, names, module_name):
+    """Evaluate the string expressions used by `__lldb_init_module`, return None if not supported"""
+    if isinstance(node, ast.Constant):
+        return node.value if isinstance(node.value, str) else None
+    if isinstance(node, ast.Name):
+        return names.get(node.id)
+    if isinstance(node, ast.JoinedStr):
+        pieces = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                if value.format_spec is not None:
+                    return None
+                value = value.value
+            piece = tool_evaluate_string_node(value, names, module_name)
+            if piece is None:
+                return None
+            pieces.append(piece)
+        return ''.join(pieces)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Mod)):
+        left = tool_evaluate_string_node(node.left, names, module_name)
+        if isinstance(node.op, ast.Mod) and isinstance(node.right, ast.Tuple):
+            right = tuple(tool_evaluate_string_node(x, names, module_name) for x in node.right.elts)
+            right = None if None in right else right
+        else:
+            right = tool_evaluate_string_node(node.right, names, module_name)
+        if left is None or right is None:
+            return None
+        try:
+            return left + right if isinstance(node.op, ast.Add) else left % right
+        except (TypeError, ValueError):
+            return None
+
+    # Note: only `os.path.splitext(os.path.basename(__file__))[0]` is the module name, the other
+    # expressions of __file__ are not supported, so the script is imported eagerly
+    if tool_is_module_name_node(node):
+        return module_name
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'replace':
+        value = tool_evaluate_string_node(node.func.value, names, module_name)
+        args = [tool_evaluate_string_node(x, names, module_name) for x in node.args]
+        if value is None or None in args or len(args) != 2:
+            return None
+        return value.replace(*args)
+
+    return None
+
+
+def tool_is_module_name_node(node):
+    """Whether the node is exactly `os.path.splitext(os.path.basename(__file__))[0]`"""
+    if not isinstance(node, ast.Subscript):
+        return False
+    index_node = node.slice.value if isinstance(node.slice, getattr(ast, 'Index', ())) else node.slice
+    if not isinstance(index_node, ast.Constant) or index_node.value != 0:
+        return False
+
+    splitext_node = node.value
+    if not tool_is_os_path_call(splitext_node, 'splitext'):
+        return False
+    basename_node = splitext_node.args[0]
+    if not tool_is_os_path_call(basename_node, 'basename'):
+        return False
+    return isinstance(basename_node.args[0], ast.Name) and basename_node.args[0].id == '__file__'
+
+
+def tool_is_os_path_call(node, function_name):
+    """Whether the node is `os.path.<function_name>(x)` with one argument"""
+    if not isinstance(node, ast.Call) or len(node.args) != 1 or node.keywords:
+        return False
+    func = node.func
+    return (isinstance(func, ast.Attribute) and func.attr == function_name
+            and isinstance(func.value, ast.Attribute) and func.value.attr == 'path'
+            and isinstance(func.value.value, ast.Name) and func.value.value.id == 'os')
+
+
+def tool_parse_command_script_add(command_string):
+    """Parse `command script add` into a dictionary with keys: name、function、help"""
+    try:
+        tokens = shlex.split(command_string)
+    except ValueError:
+        return None
+    if tokens[:3] != ['command', 'script', 'add']:
+        return None
+
+    function = None
+    help_text = ''
+    positional_list = []
+    index = 3
+    while index < len(tokens):
+        token = tokens[index]
+        if token in ('-f', '--function', '-c', '--class') and index + 1 < len(tokens):
+            function = tokens[index + 1]
+            index += 2
+        elif token in ('-h', '--help') and index + 1 < len(tokens):
+            help_text = tokens[index + 1]
+            index += 2
+        elif token in ('-s', '--synchronicity') and index + 1 < len(tokens):
+            index += 2
+        elif token in ('-o', '--overwrite'):
+            index += 1
+        elif token.startswith('-'):
+            return None
+        else:
+            positional_list.append(token)
+            index += 1
+
+    if function is None or len(positional_list) != 1 or not re.match(r'^\w+$', positional_list[0]):
+        return None
+
+    return {
+        'name': positional_list[0],
+        'function': function,
+        'help': help_text,
+    }
+
+
+def tool_is_script_file(file_name, prefix, excluded_file_names):
+    if file_name in excluded_file_names:
+        return False
+    return (file_name.endswith('.py') and file_name.startswith(prefix)) or file_name.endswith('.txt')
+
+
+def tool_file_sha1(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def run_command_parser():
+    my_parser = argparse.ArgumentParser(description='Generate the command manifest of the lldb scripts folder')
+    my_parser.add_argument('-d', '--dir', help='The folder of the lldb scripts', required=True)
+    my_parser.add_argument('-p', '--prefix', default='', help='The file name prefix of the python scripts, e.g. lldb_command_')
+    my_parser.add_argument('-x', '--exclude', nargs='*', default=LOADER_FILE_NAMES, help='The file names not loaded, e.g. the loader itself')
+    args = my_parser.parse_args()
+    return args
+
+
+def main():
+    args = run_command_parser()
+    manifest = update_manifest(os.path.realpath(os.path.expanduser(args.dir)), args.prefix, args.exclude)
+    sys.stdout.write(json.dumps(get_command_dict(manifest), indent=2, sort_keys=True, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,8 +5,12 @@ import os
 import sys
 import logging
 import json
-from collections import OrderedDict
+import hashlib
+import marshal
+import struct
+from collections import OrderedDict, deque
 import argparse
+import atomic_file_writer
 
 ## The format of the Podfile.lock
 # PODS:
@@ -41,6 +45,16 @@ POD_VERSIONS='POD_VERSIONS'
 ## Private keys
 POD_INFO_NAME='pod_name'
 POD_INFO_VERSION='pod_version'
+POD_INFO_DEPENDENCIES='pod_dependencies'
+
+## Parsed result cache
+# Note: the cache file is a header with the file size、mtime、sha1 of the Podfile.lock,
+# followed by every section marshaled separately, so a query only loads the sections it needs
+CACHE_DIR='/tmp/lldb_scripts'
+CACHE_MAGIC=b'PLCK'
+# Note: increase the version when the parser or the cache format changes, so the old caches are ignored
+CACHE_VERSION=1
+CACHED_SECTIONS=[COCOAPODS, PODS, DEPENDENCIES, SPEC_CHECKSUMS, POD_VERSIONS]
 
 
 def get_shared_logger():
@@ -222,32 +236,624 @@ def get_pod_version_dict(PODS_components, DEPENDENCIES_components):
     return pod_version_dict
 
 
-def run_podfile_lock_file_parser(podfile_lock_file_path, args):
-    get_shared_logger().info("Podfile.lock file path: %s" % podfile_lock_file_path) if args.debug else None
+def parse_podfile_lock_file(podfile_lock_file_path, debug=False):
+    """Parse the Podfile.lock file into a dictionary with keys: COCOAPODS、PODS、DEPENDENCIES、SPEC CHECKSUMS、POD_VERSIONS"""
+    with open(podfile_lock_file_path) as f:
+        # Note: stream the lines, the file content is never held as a whole
+        return parse_podfile_lock_lines(f, debug)
+
+
+def parse_podfile_lock_lines(lines, debug=False):
+    """Parse the lines of the Podfile.lock in one pass, return the same dictionary as parse_podfile_lock_file
+
+    A top-level line, e.g. `PODS:`, starts a section, which ends at the next top-level or blank line.
+    The lines of PODS、DEPENDENCIES and SPEC CHECKSUMS are parsed as they come, the others are skipped.
+    Raise ValueError if a line is malformed.
+    """
+    cocoapods_version = None
+    PODS_components = []
+    DEPENDENCIES_components = []
+    SPEC_CHECKSUMS_components = []
+
+    section_reader_dict = {
+        PODS: (read_PODS_lines, PODS_components),
+        DEPENDENCIES: (read_DEPENDENCIES_lines, DEPENDENCIES_components),
+        SPEC_CHECKSUMS: (read_SPEC_CHECKSUMS_lines, SPEC_CHECKSUMS_components),
+    }
+
+    lines = iter(lines)
+    line = next(lines, None)
+    while line is not None:
+        # Note: skip the lines of the other sections, e.g. SPEC REPOS、EXTERNAL SOURCES
+        if line.startswith(' ') or line.strip() == '':
+            line = next(lines, None)
+            continue
 
-    if not os.path.isfile(podfile_lock_file_path):
-        get_shared_logger().error("%s is not exist!" % podfile_lock_file_path)
-        sys.exit(0)
-        return
-    
+        key, _, value = line.partition(SEPARATOR)
+        if key in section_reader_dict:
+            section_reader, components = section_reader_dict[key]
+            # Note: the section reader consumes the lines of the section, and returns the line after it
+            line = section_reader(lines, components)
+            get_shared_logger().debug(f"finish {key} section") if debug else None
+            continue
+
+        if key == COCOAPODS and cocoapods_version is None:
+            if SEPARATOR in value:
+                raise ValueError(f"{line.strip()} must only have two elements")
+            cocoapods_version = value.strip()
+            print(f"cocoapods_version = {cocoapods_version}") if debug else None
+        line = next(lines, None)
+
+    pod_version_dict = get_pod_version_dict(PODS_components, DEPENDENCIES_components)
+
+    return {
+        COCOAPODS: cocoapods_version,
+        PODS: PODS_components,
+        DEPENDENCIES: DEPENDENCIES_components,
+        SPEC_CHECKSUMS: SPEC_CHECKSUMS_components,
+        POD_VERSIONS: pod_version_dict,
+    }
+
+
+def read_PODS_lines(lines, PODS_components):
+    """Append the pods of the PODS section to PODS_components. Return the first line after the section, or None"""
+    FISRT_LEVEL_PREFIX = '  - '
+    SECOND_LEVEL_PREFIX = '    - '
+
+    # Note: the dependency list of the last pod ending with `:`
+    dependency_pod_list = None
+    for line in lines:
+        if not line.startswith(' '):
+            return line
+
+        if line.startswith(SECOND_LEVEL_PREFIX):
+            if dependency_pod_list is None:
+                continue
+            dependency_pod_name, has_version, dependency_pod_version = line.partition('(')
+            if '(' in dependency_pod_version:
+                raise ValueError(f"{line.strip()} must have one or two elements")
+            if has_version:
+                dependency_pod_info = {
+                    POD_INFO_NAME: dependency_pod_name.strip(" -"),
+                    POD_INFO_VERSION: dependency_pod_version.strip(")\r\n"),
+                }
+            else:
+                dependency_pod_info = {
+                    POD_INFO_NAME: dependency_pod_name.strip(" -\r\n"),
+                }
+            if len(dependency_pod_list) == 0:
+                PODS_components[-1][POD_INFO_DEPENDENCIES] = dependency_pod_list
+            dependency_pod_list.append(dependency_pod_info)
+            continue
+
+        if not line.startswith(FISRT_LEVEL_PREFIX):
+            dependency_pod_list = None
+            continue
+
+        line = line.rstrip('\r\n')
+        pod_name, _, pod_version = line.strip(" -:").partition(" ")
+        if pod_version == '':
+            raise ValueError(f"{line.strip()} must have a version")
+        PODS_components.append({
+            POD_INFO_NAME: pod_name,
+            POD_INFO_VERSION: pod_version.partition(" ")[0].strip("()"),
+        })
+        dependency_pod_list = [] if line.endswith(":") else None
+
+    return None
+
+
+def read_DEPENDENCIES_lines(lines, DEPENDENCIES_components):
+    """Append the pods of the DEPENDENCIES section to DEPENDENCIES_components. Return the first line after the section, or None"""
+    LEVEL_PREFIX = '  - '
+
+    for line in lines:
+        if not line.startswith(' '):
+            return line
+
+        if not line.startswith(LEVEL_PREFIX):
+            continue
+
+        # Note: pod_version maybe from local source code,
+        # and maybe have words ["from", "tag", "branch", "commit"]
+        pod_name, has_version, pod_version = line.strip(" -\r\n").partition('(')
+        if '(' in pod_version:
+            raise ValueError(f"{line.strip()} must only have one or two elements")
+        if has_version:
+            pod_info = {
+                POD_INFO_NAME: pod_name.strip(' -'),
+                POD_INFO_VERSION: pod_version.strip(')'),
+            }
+        else:
+            pod_info = {
+                POD_INFO_NAME: pod_name.strip(' -'),
+            }
+        DEPENDENCIES_components.append(pod_info)
+
+    return None
+
+
+def read_SPEC_CHECKSUMS_lines(lines, SPEC_CHECKSUMS_components):
+    """Append the checksums of the SPEC CHECKSUMS section to SPEC_CHECKSUMS_components. Return the first line after the section, or None"""
+    for line in lines:
+        if not line.startswith(' '):
+            return line
+
+        components = line.split(':')
+        if len(components) == 1 and line.strip() == '':
+            continue
+        if len(components) != 2:
+            raise ValueError(f"{components} must only have two elements")
+        SPEC_CHECKSUMS_components.append({
+            "pod_name": components[0].strip(),
+            "checksum": components[1].strip(),
+        })
+
+    return None
+
+
+def load_podfile_lock_file(podfile_lock_file_path, sections=None, cache_dir=None, debug=False):
+    """Return the same dictionary as parse_podfile_lock_file, from the cache if the Podfile.lock didn't change
+
+    sections: the keys to load, e.g. [POD_VERSIONS], None for all of CACHED_SECTIONS
+    cache_dir: the folder of the cache files, CACHE_DIR by default
+    The cache is valid if the size and the mtime are the same, or else if the sha1 is the same, e.g. after a git checkout.
+    """
+    sections = CACHED_SECTIONS if sections is None else sections
+    cache_file_path = get_cache_file_path(podfile_lock_file_path, cache_dir)
+    stat = os.stat(podfile_lock_file_path)
+    header, cache_data = read_cache_file(cache_file_path)
+
+    if header is not None and header['size'] == stat.st_size:
+        sha1 = None
+        if header['mtime_ns'] != stat.st_mtime_ns:
+            sha1 = tool_file_sha1(podfile_lock_file_path)
+        if sha1 is None or sha1 == header['sha1']:
+            get_shared_logger().debug(f"load {sections} from {cache_file_path}") if debug else None
+            if sha1 is not None:
+                # Note: only the mtime changed, save it so the next load skips the sha1
+                header['mtime_ns'] = stat.st_mtime_ns
+                write_cache_file(cache_file_path, header, cache_data)
+            podfile_lock_dict = {}
+            for x in sections:
+                offset, size = header['offsets'][x]
+                podfile_lock_dict[x] = marshal.loads(cache_data[offset:offset + size])
+            return podfile_lock_dict
+
+    podfile_lock_dict = parse_podfile_lock_file(podfile_lock_file_path, debug)
+    sha1 = tool_file_sha1(podfile_lock_file_path)
+    # Note: don't save the result if the file changed while parsing
+    new_stat = os.stat(podfile_lock_file_path)
+    if (new_stat.st_size, new_stat.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        save_cache_file(cache_file_path, podfile_lock_dict, stat, sha1)
+        get_shared_logger().debug(f"save the parsed result to {cache_file_path}") if debug else None
+    return {x: podfile_lock_dict[x] for x in sections}
+
+
+def get_cache_file_path(podfile_lock_file_path, cache_dir=None):
+    # Note: read CACHE_DIR when called, so the tools can redirect it, e.g. the benchmark
+    cache_dir = cache_dir or CACHE_DIR
+    real_path = os.path.realpath(podfile_lock_file_path)
+    path_hash = hashlib.sha1(real_path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f'podfile_lock-{os.path.basename(os.path.dirname(real_path))}-{path_hash}.cache')
+
+
+def read_cache_file(cache_file_path):
+    """Return the header and the section data of the cache file, or (None, None) if it's missing or invalid"""
+    try:
+        with open(cache_file_path, 'rb') as f:
+            cache_content = f.read()
+        if cache_content[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+            return None, None
+        header_offset = len(CACHE_MAGIC) + 4
+        header_size = struct.unpack('<I', cache_content[len(CACHE_MAGIC):header_offset])[0]
+        header = marshal.loads(cache_content[header_offset:header_offset + header_size])
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        return None, None
+
+    if not isinstance(header, dict) or header.get('version') != CACHE_VERSION:
+        return None, None
+
+    return header, memoryview(cache_content)[header_offset + header_size:]
+
+
+def save_cache_file(cache_file_path, podfile_lock_dict, stat, sha1):
+    offsets = {}
+    section_data_list = []
+    data_size = 0
+    for x in CACHED_SECTIONS:
+        section_data = marshal.dumps(podfile_lock_dict[x])
+        offsets[x] = (data_size, len(section_data))
+        section_data_list.append(section_data)
+        data_size += len(section_data)
+
+    header = {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': sha1,
+        'offsets': offsets,
+    }
+    write_cache_file(cache_file_path, header, b''.join(section_data_list))
+
+
+def write_cache_file(cache_file_path, header, data):
+    header_data = marshal.dumps(header)
+
+    def write_function(f):
+        f.write(CACHE_MAGIC)
+        f.write(struct.pack('<I', len(header_data)))
+        f.write(header_data)
+        f.write(data)
+
+    try:
+        atomic_file_writer.write_file_atomically(cache_file_path, write_function, binary=True)
+    except OSError:
+        # Note: the cache is only a cache, just parse the file again next time
+        pass
+
+
+def tool_file_sha1(file_path):
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class PodDependencyGraph(object):
+    """The dependency graph of the pods in the PODS section
+
+    The pods are numbered by their order in PODS, and the edges are kept as lists of numbers in both
+    directions, so every query visits a pod and an edge at most once.
+    root_pods: merge the subspecs into their root pods, e.g. `AFNetworking/NSURLSession` -> `AFNetworking`
+    """
+    def __init__(self, PODS_components, root_pods=False):
+        self.root_pods = root_pods
+        self.pod_names = []
+        self.pod_index_dict = {}
+        # Note: pod index -> the indexes of its dependencies, and of the pods depending on it
+        self.dependency_lists = []
+        self.dependent_lists = []
+
+        edges = set()
+        for x in PODS_components:
+            pod_index = self.add_pod(x[POD_INFO_NAME])
+            for y in x.get(POD_INFO_DEPENDENCIES, []):
+                dependency_index = self.add_pod(y[POD_INFO_NAME])
+                if dependency_index == pod_index and root_pods:
+                    continue
+                if (pod_index, dependency_index) in edges:
+                    continue
+                edges.add((pod_index, dependency_index))
+                self.dependency_lists[pod_index].append(dependency_index)
+                self.dependent_lists[dependency_index].append(pod_index)
+
+    def add_pod(self, pod_name):
+        pod_name = self.get_pod_name(pod_name)
+        pod_index = self.pod_index_dict.get(pod_name)
+        if pod_index is None:
+            pod_index = self.pod_index_dict[pod_name] = len(self.pod_names)
+            self.pod_names.append(pod_name)
+            self.dependency_lists.append([])
+            self.dependent_lists.append([])
+        return pod_index
+
+    def get_pod_name(self, pod_name):
+        return pod_name.split('/')[0] if self.root_pods else pod_name
+
+    def get_dependencies(self, pod_name, transitive=True):
+        """Return the pods which the pod depends on, the nearest first. Return None if the pod isn't in the graph"""
+        return self.walk(pod_name, self.dependency_lists, transitive)
+
+    def get_dependents(self, pod_name, transitive=True):
+        """Return the pods depending on the pod, the nearest first. Return None if the pod isn't in the graph"""
+        return self.walk(pod_name, self.dependent_lists, transitive)
+
+    def walk(self, pod_name, edge_lists, transitive):
+        start_index = self.pod_index_dict.get(self.get_pod_name(pod_name))
+        if start_index is None:
+            return None
+
+        visited = {start_index}
+        pending_indexes = deque([start_index])
+        result = []
+        while pending_indexes:
+            for x in edge_lists[pending_indexes.popleft()]:
+                if x in visited:
+                    continue
+                visited.add(x)
+                result.append(self.pod_names[x])
+                if transitive:
+                    pending_indexes.append(x)
+
+        return result
+
+    def get_topological_order(self):
+        """Return the pods ordered so that every pod comes after its dependencies
+
+        The pods in a cycle and the pods depending on them are left out, see find_cycles.
+        """
+        dependency_counts = [len(x) for x in self.dependency_lists]
+        pending_indexes = deque(x for x, count in enumerate(dependency_counts) if count == 0)
+        result = []
+        while pending_indexes:
+            pod_index = pending_indexes.popleft()
+            result.append(self.pod_names[pod_index])
+            for x in self.dependent_lists[pod_index]:
+                dependency_counts[x] -= 1
+                if dependency_counts[x] == 0:
+                    pending_indexes.append(x)
+
+        return result
+
+    def find_cycles(self):
+        """Return the strongly connected components with a cycle, every one is a list of pod names"""
+        # Note: Tarjan's algorithm without recursion, a Podfile.lock may have thousands of pods
+        next_order = 0
+        orders = [None] * len(self.pod_names)
+        low_links = [0] * len(self.pod_names)
+        on_stack = [False] * len(self.pod_names)
+        stack = []
+        cycles = []
+
+        for root_index in range(len(self.pod_names)):
+            if orders[root_index] is not None:
+                continue
+
+            # Note: (pod index, the position of the next edge to visit)
+            call_stack = [(root_index, 0)]
+            while call_stack:
+                pod_index, edge_position = call_stack.pop()
+                if edge_position == 0:
+                    orders[pod_index] = low_links[pod_index] = next_order
+                    next_order += 1
+                    stack.append(pod_index)
+                    on_stack[pod_index] = True
+                else:
+                    # Note: back from the dependency visited before this position
+                    child_index = self.dependency_lists[pod_index][edge_position - 1]
+                    low_links[pod_index] = min(low_links[pod_index], low_links[child_index])
+
+                dependency_list = self.dependency_lists[pod_index]
+                while edge_position < len(dependency_list):
+                    child_index = dependency_list[edge_position]
+                    edge_position += 1
+                    if orders[child_index] is None:
+                        call_stack.append((pod_index, edge_position))
+                        call_stack.append((child_index, 0))
+                        break
+                    if on_stack[child_index]:
+                        low_links[pod_index] = min(low_links[pod_index], orders[child_index])
+                else:
+                    if low_links[pod_index] != orders[pod_index]:
+                        continue
+                    component = []
+                    while True:
+                        x = stack.pop()
+                        on_stack[x] = False
+                        component.append(x)
+                        if x == pod_index:
+                            break
+                    if len(component) > 1 or pod_index in self.dependency_lists[pod_index]:
+                        cycles.append([self.pod_names[x] for x in reversed(component)])
+
+        return cycles
+
+
+def get_dependency_graph(podfile_lock_file_path, root_pods=False, debug=False):
+    """Return the PodDependencyGraph of the Podfile.lock, the PODS section is loaded from the cache"""
+    podfile_lock_dict = load_podfile_lock_file(podfile_lock_file_path, [PODS], debug=debug)
+    return PodDependencyGraph(podfile_lock_dict[PODS], root_pods)
+
+
+def diff_podfile_lock_files(old_podfile_lock_file_path, new_podfile_lock_file_path, use_cache=False, debug=False):
+    """Return the pods added、removed or changed between the two Podfile.lock files, see diff_podfile_lock_dicts
+
+    use_cache: load the files through the cache in CACHE_DIR. It's off by default, the historical Podfile.lock
+    files are usually temporary files, which would only miss the cache and leave the cache files behind.
+    """
+    if use_cache:
+        sections = [POD_VERSIONS, SPEC_CHECKSUMS]
+        old_podfile_lock_dict = load_podfile_lock_file(old_podfile_lock_file_path, sections, debug=debug)
+        new_podfile_lock_dict = load_podfile_lock_file(new_podfile_lock_file_path, sections, debug=debug)
+    else:
+        old_podfile_lock_dict = parse_podfile_lock_file(old_podfile_lock_file_path, debug)
+        new_podfile_lock_dict = parse_podfile_lock_file(new_podfile_lock_file_path, debug)
+    return diff_podfile_lock_dicts(old_podfile_lock_dict, new_podfile_lock_dict)
+
+
+def diff_podfile_lock_dicts(old_podfile_lock_dict, new_podfile_lock_dict):
+    """Compare the pod versions and the checksums of the two parsed Podfile.lock dictionaries
+
+    Return a dictionary with keys: added、removed、changed of the pod versions, and checksums with the same keys,
+    e.g. {"added": {"A": "1.0"}, "removed": {}, "changed": {"B": {"old": "1.0", "new": "2.0"}}, "checksums": {...}}
+    """
+    old_checksum_dict = {x["pod_name"]: x["checksum"] for x in old_podfile_lock_dict[SPEC_CHECKSUMS]}
+    new_checksum_dict = {x["pod_name"]: x["checksum"] for x in new_podfile_lock_dict[SPEC_CHECKSUMS]}
+
+    diff_dict = tool_diff_dicts(old_podfile_lock_dict[POD_VERSIONS], new_podfile_lock_dict[POD_VERSIONS])
+    diff_dict['checksums'] = tool_diff_dicts(old_checksum_dict, new_checksum_dict)
+    return diff_dict
+
+
+def tool_diff_dicts(old_dict, new_dict):
+    if old_dict == new_dict:
+        return {'added': {}, 'removed': {}, 'changed': {}}
+
+    return {
+        'added': {k: v for k, v in new_dict.items() if k not in old_dict},
+        'removed': {k: v for k, v in old_dict.items() if k not in new_dict},
+        'changed': {k: {'old': old_dict[k], 'new': v} for k, v in new_dict.items() if k in old_dict and old_dict[k] != v},
+    }
+
+
+class PodfileLock(object):
+    """The parsed Podfile.lock for the library users, every section is loaded the first time it's used
+
+    It raises OSError if the file can't be read, ValueError if it's malformed, and never exits, e.g.
+
+    podfile_lock = PodfileLock('path/to/Podfile.lock')
+    podfile_lock.get_pod_version('AFNetworking')
+    podfile_lock.get_dependency_graph().get_dependents('AFNetworking')
+    """
+    QUERY_TYPES = ['version', 'checksum', 'dependencies', 'dependents', 'topological_order', 'cycles']
+
+    def __init__(self, podfile_lock_file_path, use_cache=True, debug=False):
+        if not os.path.isfile(podfile_lock_file_path):
+            raise FileNotFoundError(f"{podfile_lock_file_path} is not exist!")
+        self.podfile_lock_file_path = podfile_lock_file_path
+        self.use_cache = use_cache
+        self.debug = debug
+        self.section_dict = {}
+        self.checksum_dict = None
+        self.graph_dict = {}
+
+    def get_section(self, section):
+        """Return the parsed section, one of CACHED_SECTIONS"""
+        if section not in self.section_dict:
+            if self.use_cache:
+                self.section_dict.update(load_podfile_lock_file(self.podfile_lock_file_path, [section], debug=self.debug))
+            else:
+                # Note: parse the whole file once and keep all the sections
+                self.section_dict.update(parse_podfile_lock_file(self.podfile_lock_file_path, self.debug))
+
+        return self.section_dict[section]
+
+    def get_pod_version(self, pod_name):
+        return self.get_section(POD_VERSIONS).get(pod_name)
+
+    def get_checksum(self, pod_name):
+        if self.checksum_dict is None:
+            self.checksum_dict = {x["pod_name"]: x["checksum"] for x in self.get_section(SPEC_CHECKSUMS)}
+        return self.checksum_dict.get(pod_name)
+
+    def get_dependency_graph(self, root_pods=False):
+        if root_pods not in self.graph_dict:
+            self.graph_dict[root_pods] = PodDependencyGraph(self.get_section(PODS), root_pods)
+        return self.graph_dict[root_pods]
+
+    def query(self, query):
+        """Answer the query dictionary with keys: query、pod_name, and the optional direct、root_pods、id
+
+        query: one of QUERY_TYPES, `version` by default.
+        Return the query dictionary with the key `result`, or `error` if the query is invalid.
+        """
+        answer = dict(query)
+        query_type = query.get('query', 'version')
+        pod_name = query.get('pod_name')
+        if query_type not in self.QUERY_TYPES:
+            answer['error'] = f"unknown query: {query_type}, must be one of {self.QUERY_TYPES}"
+            return answer
+        if query_type not in ('topological_order', 'cycles') and not isinstance(pod_name, str):
+            answer['error'] = f"{query_type} query needs a pod_name"
+            return answer
+
+        if query_type == 'version':
+            answer['result'] = self.get_pod_version(pod_name)
+        elif query_type == 'checksum':
+            answer['result'] = self.get_checksum(pod_name)
+        else:
+            graph = self.get_dependency_graph(bool(query.get('root_pods', False)))
+            if query_type == 'dependencies':
+                answer['result'] = graph.get_dependencies(pod_name, not query.get('direct', False))
+            elif query_type == 'dependents':
+                answer['result'] = graph.get_dependents(pod_name, not query.get('direct', False))
+            elif query_type == 'topological_order':
+                answer['result'] = graph.get_topological_order()
+            else:
+                answer['result'] = graph.find_cycles()
+
+        return answer
+
+
+def run_stdin_queries(podfile_lock, input_file, output_file):
+    """Answer the queries from the input file line by line, and write one JSON answer per line
+
+    A line is a pod name for its version, or a JSON query dictionary, see PodfileLock.query
+    """
+    for line in input_file:
+        line = line.strip()
+        if line == '':
+            continue
+
+        if line.startswith('{'):
+            try:
+                query = json.loads(line)
+            except ValueError as e:
+                query = None
+            if not isinstance(query, dict):
+                query = None
+                answer = {'line': line, 'error': 'invalid JSON query'}
+        else:
+            query = {'query': 'version', 'pod_name': line}
+
+        if query is not None:
+            try:
+                answer = podfile_lock.query(query)
+            except (OSError, ValueError, TypeError) as e:
+                # Note: report the failure of the query, and keep answering the next ones
+                answer = dict(query)
+                answer['error'] = f"{e}"
+
+        output_file.write(json.dumps(answer) + '\n')
+        # Note: flush every answer, the caller may wait for it before writing the next query
+        output_file.flush()
+
+
+def parse_podfile_lock_file_by_sections(podfile_lock_file_path, debug=False):
+    """The section by section parser, every section slices the whole file content again
+
+    Note: replaced by parse_podfile_lock_file, only kept to compare with it, see benchmark/benchmark_podfile_lock_parser.py
+    """
     with open(podfile_lock_file_path) as f:
         file_content = f.read()
         f.close()
-    
+
     cocoapods_version = get_cocoapods_version(file_content)
-    print(f"cocoapods_version = {cocoapods_version}") if args.debug else None
+    print(f"cocoapods_version = {cocoapods_version}") if debug else None
     PODS_components = get_PODS_components(cocoapods_version, file_content)
-    get_shared_logger().debug(f"finish {PODS} section") if args.debug else None
+    get_shared_logger().debug(f"finish {PODS} section") if debug else None
 
     DEPENDENCIES_components = get_DEPENDENCIES_components(cocoapods_version, file_content)
-    get_shared_logger().debug(f"finish {DEPENDENCIES} section") if args.debug else None
+    get_shared_logger().debug(f"finish {DEPENDENCIES} section") if debug else None
 
     SPEC_CHECKSUMS_components = get_SPEC_CHECKSUMS_components(cocoapods_version, file_content)
-    get_shared_logger().debug(f"finish {SPEC_CHECKSUMS} section") if args.debug else None
+    get_shared_logger().debug(f"finish {SPEC_CHECKSUMS} section") if debug else None
 
     pod_version_dict= get_pod_version_dict(PODS_components, DEPENDENCIES_components)
 
-    if args.json_output_file and args.json_output_file.strip():
+    return {
+        COCOAPODS: cocoapods_version,
+        PODS: PODS_components,
+        DEPENDENCIES: DEPENDENCIES_components,
+        SPEC_CHECKSUMS: SPEC_CHECKSUMS_components,
+        POD_VERSIONS: pod_version_dict,
+    }
+
+
+def run_podfile_lock_file_parser(podfile_lock_file_path, args):
+    get_shared_logger().info("Podfile.lock file path: %s" % podfile_lock_file_path) if args.debug else None
+
+    if not os.path.isfile(podfile_lock_file_path):
+        get_shared_logger().error("%s is not exist!" % podfile_lock_file_path)
+        sys.exit(0)
+        return
+
+    json_output = args.json_output_file and args.json_output_file.strip()
+    graph_query = args.dependencies or args.dependents or args.topological_order or args.cycles
+    if args.no_cache:
+        podfile_lock_dict = parse_podfile_lock_file(podfile_lock_file_path, args.debug)
+    else:
+        # Note: only the queries, load the pod versions and the PODS for the graph without the other sections
+        sections = None if json_output else [POD_VERSIONS, PODS] if graph_query else [POD_VERSIONS]
+        podfile_lock_dict = load_podfile_lock_file(podfile_lock_file_path, sections, debug=args.debug)
+    pod_version_dict = podfile_lock_dict[POD_VERSIONS]
+
+    if json_output:
+        PODS_components = podfile_lock_dict[PODS]
+        DEPENDENCIES_components = podfile_lock_dict[DEPENDENCIES]
+        SPEC_CHECKSUMS_components = podfile_lock_dict[SPEC_CHECKSUMS]
         out_file = open(args.json_output_file, "w")
         json_list = [
             { PODS: PODS_components },
@@ -266,22 +872,66 @@ def run_podfile_lock_file_parser(podfile_lock_file_path, args):
                 pod_dict[x] = pod_version_dict[x]
         output = json.dumps(pod_dict)
         sys.stdout.write(output)
-    
+
+    if graph_query:
+        graph = PodDependencyGraph(podfile_lock_dict[PODS], args.root_pods)
+        graph_dict = {}
+        if args.dependencies:
+            graph_dict['dependencies'] = {x: graph.get_dependencies(x, not args.direct) for x in args.dependencies}
+        if args.dependents:
+            graph_dict['dependents'] = {x: graph.get_dependents(x, not args.direct) for x in args.dependents}
+        if args.topological_order:
+            graph_dict['topological_order'] = graph.get_topological_order()
+        if args.cycles:
+            graph_dict['cycles'] = graph.find_cycles()
+        sys.stdout.write('\n') if isinstance(args.query_pod_list, list) else None
+        sys.stdout.write(json.dumps(graph_dict))
+
     return
 
 
 def run_command_parser():
     my_parser = argparse.ArgumentParser(description='Parse the Podfile.lock file')
-    my_parser.add_argument('-p', '--path', help='The path of Podfile.lock file', required=True)
+    my_parser.add_argument('-p', '--path', help='The path of Podfile.lock file')
     my_parser.add_argument('-d', '--debug', action='store_true', help='The debug mode')
     my_parser.add_argument('-j', '--json-output-file', help='The path of output JSON file', required=False)
     my_parser.add_argument('-q', '--query-pod-list', action='store', type=str, nargs='+')
+    my_parser.add_argument('--deps', dest='dependencies', nargs='+', help='Query the pods which the pods depend on, the unknown pods are null')
+    my_parser.add_argument('--dependents', nargs='+', help='Query the pods depending on the pods, the unknown pods are null')
+    my_parser.add_argument('--direct', action='store_true', help='Only the direct dependencies or dependents, not the transitive ones')
+    my_parser.add_argument('--topo', dest='topological_order', action='store_true', help='Output the pods ordered so that every pod comes after its dependencies')
+    my_parser.add_argument('--cycles', action='store_true', help='Output the dependency cycles')
+    my_parser.add_argument('--root-pods', action='store_true', help='Merge the subspecs into their root pods in the dependency graph')
+    my_parser.add_argument('-n', '--no-cache', action='store_true', help=f'Parse the file without the cache in {CACHE_DIR}')
+    my_parser.add_argument('-i', '--stdin', action='store_true', help='Answer the queries from stdin line by line in JSON lines, a line is a pod name or a JSON query')
+    my_parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'), help='Output the pods added、removed or changed from the old Podfile.lock to the new one')
+    my_parser.add_argument('--diff-cache', action='store_true', help=f'Load the --diff files through the cache in {CACHE_DIR}, for the files kept at the same paths')
     args = my_parser.parse_args()
+    if args.path is None and args.diff is None:
+        my_parser.error('the following arguments are required: -p/--path or --diff')
     return args
 
 
 def main():
     args = run_command_parser()
+    if args.diff:
+        for x in args.diff:
+            if not os.path.isfile(x):
+                get_shared_logger().error("%s is not exist!" % x)
+                return 1
+        use_cache = args.diff_cache and not args.no_cache
+        sys.stdout.write(json.dumps(diff_podfile_lock_files(args.diff[0], args.diff[1], use_cache, args.debug)))
+        return 0
+
+    if args.stdin:
+        try:
+            podfile_lock = PodfileLock(args.path, not args.no_cache, args.debug)
+        except OSError as e:
+            get_shared_logger().error(f"{e}")
+            return 1
+        run_stdin_queries(podfile_lock, sys.stdin, sys.stdout)
+        return 0
+
     run_podfile_lock_file_parser(args.path, args)
 
 
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# A small HTTP client for the podspec queries of lldb_command_show_source_code.py
+#
+# - a pool of keep-alive connections per host, reused by the following requests of any thread
+# - a socket timeout for every request, so a slow server can't freeze lldb
+# - bounded retries with exponential backoff for connection errors and 429/5xx
+# - batch GET of many urls with one long-lived thread pool
+# - streaming GET for the large downloads, e.g. the source archives
+#
+# Benchmark against the stand-in server, see podspec_stand_in_server.py
+#
+# $ python3 podspec_stand_in_server.py -p 8080 -l 20 &
+# $ python3 podspec_http_client.py -u 'http://127.0.0.1:8080/{pod_name}/{pod_version}' -q AFNetworking:4.0.1 SDWebImage:5.0.0 -r 50
+
+import argparse
+import concurrent.futures
+import http.client
+import sys
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+HttpResponse = namedtuple('HttpResponse', ['status', 'headers', 'body'])
+
+
+class HttpClientError(Exception):
+    pass
+
+
+class HttpClient(object):
+    def __init__(self, timeout=10, retries=2, backoff=0.2, max_workers=4, keep_alive=True):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.keep_alive = keep_alive
+        # Note: (scheme, netloc) -> the idle connections, a connection is used by one request at a time
+        self._idle_connections = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'connections': 0,
+            'retries': 0,
+        }
+
+    def get(self, url, headers=None):
+        """GET the url. Return a HttpResponse, raise HttpClientError if all attempts failed"""
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        path = f'{path}?{parts.query}' if parts.query else path
+        headers = dict(headers or {})
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
+
+        key = (parts.scheme, parts.netloc)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self._add_stat('retries')
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+            try:
+                connection, response, body = self._request(key, path, headers)
+            except (OSError, http.client.HTTPException) as e:
+                last_error = e
+                continue
+
+            self._release_connection(key, connection, self.keep_alive and not response.will_close)
+
+            last_error = None
+            http_response = HttpResponse(response.status, response.headers, body)
+            if response.status not in RETRY_STATUS_CODES:
+                return http_response
+
+        if last_error is not None:
+            raise HttpClientError(f'GET {url} failed after {self.retries + 1} attempts: {last_error}')
+
+        return http_response
+
+    def get_stream(self, url, headers=None):
+        """GET the url without reading the body. Return the http.client.HTTPResponse, the caller reads and closes it
+
+        The response holds its own connection, so it's not shared with the other requests.
+        Retry the same as get, but only before the body is read.
+        """
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        path = f'{path}?{parts.query}' if parts.query else path
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        # Note: with `Connection: close`, http.client passes the socket to the response
+        headers = dict(headers or {})
+        headers['Connection'] = 'close'
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self._add_stat('retries')
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+            connection = connection_class(parts.netloc, timeout=self.timeout)
+            self._add_stat('connections')
+            self._add_stat('requests')
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                last_error = e
+                continue
+
+            if response.status in RETRY_STATUS_CODES and attempt < self.retries:
+                response.close()
+                continue
+            return response
+
+        raise HttpClientError(f'GET {url} failed after {self.retries + 1} attempts: {last_error}')
+
+    def get_batch(self, urls, headers_list=None):
+        """GET the urls concurrently. Return a list of HttpResponse or HttpClientError in the same order"""
+        headers_list = headers_list or [None] * len(urls)
+
+        def get_or_error(url, headers):
+            try:
+                return self.get(url, headers)
+            except HttpClientError as e:
+                return e
+
+        return list(self.get_executor().map(get_or_error, urls, headers_list))
+
+    def get_executor(self):
+        """Return the long-lived thread pool of max_workers, shared by the batches, it's shut down by close"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max(self.max_workers, 1), thread_name_prefix='podspec_http_client')
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        with self._lock:
+            for connections in self._idle_connections.values():
+                for connection in connections:
+                    connection.close()
+            self._idle_connections.clear()
+
+    def _request(self, key, path, headers):
+        """Send the request on a pooled connection. Return (connection, response, body), raise OSError or HTTPException if failed"""
+        connection, reused = self._acquire_connection(key)
+        while True:
+            response = None
+            self._add_stat('requests')
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                # Note: read the whole body, otherwise the connection can't be reused
+                body = response.read()
+                return connection, response, body
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                # Note: the server may close an idle connection at any time, if the reused one fails
+                # before any response, try once more on a new connection, it's not a retry
+                if not reused or response is not None:
+                    raise
+            connection, reused = self._new_connection(key), False
+
+    def _acquire_connection(self, key):
+        """Return (connection, reused), reused is True if it's from the idle pool"""
+        with self._lock:
+            connections = self._idle_connections.get(key)
+            if connections:
+                return connections.pop(), True
+
+        return self._new_connection(key), False
+
+    def _new_connection(self, key):
+        scheme, netloc = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        self._add_stat('connections')
+        return connection_class(netloc, timeout=self.timeout)
+
+    def _release_connection(self, key, connection, reusable):
+        """Put the connection back to the idle pool, at most max_workers idle connections per host are kept"""
+        if reusable:
+            with self._lock:
+                connections = self._idle_connections.setdefault(key, [])
+                if len(connections) < max(self.max_workers, 1):
+                    connections.append(connection)
+                    return
+        connection.close()
+
+    def _add_stat(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def run_command_parser():
+    my_parser = argparse.ArgumentParser(description='Query the podspecs and report the latency and the throughput')
+    my_parser.add_argument('-u', '--url', help='The podspec query url with {pod_name} and {pod_version}', required=True)
+    my_parser.add_argument('-q', '--query-pod-list', help='The pods to query, e.g. AFNetworking:4.0.1', nargs='+', required=True)
+    my_parser.add_argument('-r', '--repeat', type=int, default=1, help='Query the pod list N times')
+    my_parser.add_argument('-w', '--workers', type=int, default=4, help='The number of concurrent requests')
+    my_parser.add_argument('-t', '--timeout', type=float, default=10, help='The timeout in seconds of every request')
+    my_parser.add_argument('-k', '--no-keep-alive', action='store_true', help='Open a new connection for every request')
+    args = my_parser.parse_args()
+    return args
+
+
+def main():
+    args = run_command_parser()
+    urls = []
+    for x in args.query_pod_list * args.repeat:
+        pod_name, _, pod_version = x.partition(':')
+        urls.append(args.url.format(pod_name=pod_name, pod_version=pod_version))
+
+    client = HttpClient(timeout=args.timeout, max_workers=args.workers, keep_alive=not args.no_keep_alive)
+    start_time = time.perf_counter()
+    responses = client.get_batch(urls)
+    cost = time.perf_counter() - start_time
+    client.close()
+
+    failed_count = len([x for x in responses if isinstance(x, HttpClientError) or x.status != 200])
+    print(f'requests: {len(urls)}, failed: {failed_count}, connections: {client.stats["connections"]}, retries: {client.stats["retries"]}')
+    print(f'total: {cost * 1000:.1f} ms, {len(urls) / cost:.1f} requests/s, {cost * 1000 / len(urls):.2f} ms/request')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
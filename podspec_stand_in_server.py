@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# A local stand-in of the podspec query server, for benchmarking show_source_code offline
+#
+# Usage:
+# $ python3 podspec_stand_in_server.py -p 8080 -l 20
+# and put the following line in the .env file
+#
+# podspec_query_api = http://127.0.0.1:8080/{pod_name}/{pod_version}
+#
+# The server answers `/<pod_name>/<pod_version>` with a podspec like
+# {"name": ..., "version": ..., "source": {"git": ..., "commit": ...}}, so use
+# `git_url_keyPath = source.git` and `git_commit_keyPath = source.commit`.
+# The podspecs can be given by a JSON file, {"<pod_name>/<pod_version>": {...}}
+#
+# The responses have an ETag, and `If-None-Match` gets a 304.
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+class PodspecRequestHandler(BaseHTTPRequestHandler):
+    # Note: HTTP/1.1 keeps the connection alive
+    protocol_version = 'HTTP/1.1'
+    # Note: the headers and the body are written separately, avoid the delayed ACK on the kept-alive connections
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        server.add_stat('requests')
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.error_rate and random.random() < server.error_rate:
+            server.add_stat('errors')
+            self.send_json(503, {'error': 'service unavailable'})
+            return
+
+        components = [unquote(x) for x in urlsplit(self.path).path.split('/') if x]
+        if len(components) < 2:
+            self.send_json(404, {'error': f'expect /<pod_name>/<pod_version>, but got {self.path}'})
+            return
+
+        pod_name, pod_version = components[-2], components[-1]
+        content_dict = server.get_podspec(pod_name, pod_version)
+        if content_dict is None:
+            self.send_json(404, {'error': f'{pod_name} ({pod_version}) not found'})
+            return
+
+        body = json.dumps(content_dict).encode('utf-8')
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            server.add_stat('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_body(200, body, {'ETag': etag})
+
+    def send_json(self, status, content_dict):
+        self.send_body(status, json.dumps(content_dict).encode('utf-8'))
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def setup(self):
+        super().setup()
+        self.server.add_stat('connections')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PodspecStandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, podspec_dict=None, latency=0, error_rate=0, verbose=False):
+        super().__init__(address, PodspecRequestHandler)
+        self.podspec_dict = podspec_dict
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.stats = {
+            'connections': 0,
+            'requests': 0,
+            'not_modified': 0,
+            'errors': 0,
+        }
+        self._lock = threading.Lock()
+
+    def get_podspec(self, pod_name, pod_version):
+        if self.podspec_dict is not None:
+            return self.podspec_dict.get(f'{pod_name}/{pod_version}')
+
+        # Note: without the podspec file, make up a stable podspec for any pod
+        return {
+            'name': pod_name,
+            'version': pod_version,
+            'source': {
+                'git': f'https://git.example.com/pods/{pod_name}.git',
+                'commit': hashlib.sha1(f'{pod_name}/{pod_version}'.encode('utf-8')).hexdigest(),
+            },
+        }
+
+    def add_stat(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def start_stand_in_server(port=0, podspec_dict=None, latency=0, error_rate=0):
+    """Start the server in a background thread, the latency is in seconds. Return the server, its url is server.url_template"""
+    server = PodspecStandInServer(('127.0.0.1', port), podspec_dict, latency, error_rate)
+    server.url_template = f'http://127.0.0.1:{server.server_address[1]}/{{pod_name}}/{{pod_version}}'
+    thread = threading.Thread(target=server.serve_forever, name='podspec_stand_in_server', daemon=True)
+    thread.start()
+    return server
+
+
+def run_command_parser():
+    my_parser = argparse.ArgumentParser(description='Run a local stand-in of the podspec query server')
+    my_parser.add_argument('-p', '--port', type=int, default=8080, help='The port to listen on 127.0.0.1')
+    my_parser.add_argument('-f', '--podspec-file', help='The JSON file of podspecs, {"<pod_name>/<pod_version>": {...}}')
+    my_parser.add_argument('-l', '--latency', type=float, default=0, help='The latency in milliseconds of every response')
+    my_parser.add_argument('-e', '--error-rate', type=float, default=0, help='The rate of 503 responses, from 0 to 1')
+    my_parser.add_argument('-v', '--verbose', action='store_true', help='Log every request')
+    args = my_parser.parse_args()
+    return args
+
+
+def main():
+    args = run_command_parser()
+    podspec_dict = None
+    if args.podspec_file:
+        with open(args.podspec_file) as f:
+            podspec_dict = json.load(f)
+
+    server = PodspecStandInServer(('127.0.0.1', args.port), podspec_dict, args.latency / 1000, args.error_rate, args.verbose)
+    print(f'podspec_query_api = http://127.0.0.1:{server.server_address[1]}/{{pod_name}}/{{pod_version}}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'\n{json.dumps(server.stats)}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
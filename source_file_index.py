@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# A persistent file name -> paths index of a source code repository
+#
+# The index records every folder with its mtime, its file names and its sub folder names:
+# - the first build walks the top-level folders in parallel
+# - the refresh only lists the folders whose mtime changed, the mtime of a folder changes
+#   when a file is added, removed or renamed in it
+# - the index is saved in /tmp/lldb_scripts, next to the script manifests
+#
+# Usage:
+# $ python3 source_file_index.py -r ~/path/to/repo/root -f main.m -b /build/path/to/main.m
+
+import argparse
+import atomic_file_writer
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import source_path_resolver
+
+INDEX_DIR = '/tmp/lldb_scripts'
+INDEX_VERSION = 1
+EXCLUDED_DIR_NAMES = ['.git', '.svn', '.hg', 'DerivedData', 'node_modules']
+
+
+class SourceFileIndex(object):
+    def __init__(self, repo_root, index_file_path=None, max_workers=8, excluded_dir_names=EXCLUDED_DIR_NAMES):
+        self.repo_root = os.path.realpath(os.path.expanduser(repo_root))
+        self.index_file_path = index_file_path or get_index_file_path(self.repo_root)
+        self.max_workers = max_workers
+        self.excluded_dir_names = set(excluded_dir_names)
+        # Note: relative folder path -> dictionary with keys: mtime_ns、files、dirs, the root folder is ''
+        self.dir_dict = {}
+        # Note: file name -> list of relative file paths
+        self.file_name_dict = {}
+        self._lock = threading.Lock()
+
+    def update(self):
+        """Load the saved index and refresh the changed folders, or build it if not saved. Return the changed folder count"""
+        with self._lock:
+            if len(self.dir_dict) == 0:
+                self.dir_dict = self.load()
+
+            if len(self.dir_dict) == 0:
+                self.dir_dict = self.build()
+                changed_count = len(self.dir_dict)
+            else:
+                changed_count = self.refresh()
+
+            if changed_count > 0:
+                self.save()
+            self.file_name_dict = tool_make_file_name_dict(self.dir_dict)
+
+        return changed_count
+
+    def build(self):
+        """Walk the whole repository, the top-level folders are walked in parallel"""
+        dir_dict = {}
+        root_entry = self.scan_dir('')
+        if root_entry is None:
+            return dir_dict
+        dir_dict[''] = root_entry
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(self.max_workers, 1)) as executor:
+            for sub_dir_dict in executor.map(self.walk_dir, root_entry['dirs']):
+                dir_dict.update(sub_dir_dict)
+
+        return dir_dict
+
+    def refresh(self):
+        """Rescan the folders whose mtime changed. Return the changed folder count"""
+        changed_count = 0
+        # Note: the parent folders are listed before their sub folders
+        for relative_dir in sorted(self.dir_dict.keys()):
+            entry = self.dir_dict.get(relative_dir)
+            if entry is None:
+                continue
+            try:
+                mtime_ns = os.stat(os.path.join(self.repo_root, relative_dir)).st_mtime_ns
+            except OSError:
+                self.remove_dir(relative_dir)
+                changed_count += 1
+                continue
+            if mtime_ns == entry['mtime_ns']:
+                continue
+
+            new_entry = self.scan_dir(relative_dir)
+            if new_entry is None:
+                self.remove_dir(relative_dir)
+                changed_count += 1
+                continue
+            for dir_name in set(entry['dirs']) - set(new_entry['dirs']):
+                self.remove_dir(tool_join_relative_path(relative_dir, dir_name))
+            for dir_name in set(new_entry['dirs']) - set(entry['dirs']):
+                self.dir_dict.update(self.walk_dir(tool_join_relative_path(relative_dir, dir_name)))
+            self.dir_dict[relative_dir] = new_entry
+            changed_count += 1
+
+        return changed_count
+
+    def remove_dir(self, relative_dir):
+        entry = self.dir_dict.pop(relative_dir, None)
+        if entry is None:
+            return
+        for dir_name in entry['dirs']:
+            self.remove_dir(tool_join_relative_path(relative_dir, dir_name))
+
+    def walk_dir(self, relative_dir):
+        """Scan the folder and all its sub folders. Return a dictionary of relative folder path -> entry"""
+        dir_dict = {}
+        pending_dirs = [relative_dir]
+        while pending_dirs:
+            current_dir = pending_dirs.pop()
+            entry = self.scan_dir(current_dir)
+            if entry is None:
+                continue
+            dir_dict[current_dir] = entry
+            pending_dirs.extend(tool_join_relative_path(current_dir, x) for x in entry['dirs'])
+
+        return dir_dict
+
+    def scan_dir(self, relative_dir):
+        """List the folder. Return the entry with keys: mtime_ns、files、dirs, or None if failed"""
+        dir_path = os.path.join(self.repo_root, relative_dir)
+        files = []
+        dirs = []
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+            with os.scandir(dir_path) as it:
+                for x in it:
+                    # Note: don't follow the symbolic links, same as os.walk
+                    if x.is_dir(follow_symlinks=False):
+                        if x.name not in self.excluded_dir_names:
+                            dirs.append(x.name)
+                    else:
+                        files.append(x.name)
+        except OSError:
+            return None
+
+        return {
+            'mtime_ns': mtime_ns,
+            'files': sorted(files),
+            'dirs': sorted(dirs),
+        }
+
+    def find(self, file_name, build_path=None):
+        """Return the absolute path of the file. If several files have the name, return the one best matches the build path"""
+        relative_paths = self.file_name_dict.get(file_name)
+        if not relative_paths:
+            return None
+
+        relative_path = relative_paths[0]
+        if len(relative_paths) > 1 and build_path:
+            relative_path = max(relative_paths, key=lambda x: tool_get_common_suffix_count(build_path, x))
+
+        return os.path.join(self.repo_root, relative_path)
+
+    def load(self):
+        try:
+            with open(self.index_file_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if index.get('version') != INDEX_VERSION or index.get('repo_root') != self.repo_root or index.get('excluded') != sorted(self.excluded_dir_names):
+            return {}
+
+        return index['dirs']
+
+    def save(self):
+        index = {
+            'version': INDEX_VERSION,
+            'repo_root': self.repo_root,
+            'excluded': sorted(self.excluded_dir_names),
+            'dirs': self.dir_dict,
+        }
+        try:
+            atomic_file_writer.write_file_atomically(self.index_file_path, lambda f: json.dump(index, f, ensure_ascii=False))
+        except OSError:
+            # Note: the index is only a cache, just rebuild it next time
+            pass
+
+
+def get_index_file_path(repo_root):
+    repo_hash = hashlib.sha1(repo_root.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(INDEX_DIR, f'file_index-{os.path.basename(repo_root)}-{repo_hash}.json')
+
+
+def tool_make_file_name_dict(dir_dict):
+    file_name_dict = {}
+    for relative_dir, entry in dir_dict.items():
+        for file_name in entry['files']:
+            file_name_dict.setdefault(file_name, []).append(tool_join_relative_path(relative_dir, file_name))
+
+    return file_name_dict
+
+
+def tool_join_relative_path(relative_dir, name):
+    return f'{relative_dir}/{name}' if relative_dir else name
+
+
+def tool_get_common_suffix_count(build_path, relative_path):
+    build_components = source_path_resolver.tool_split_path(build_path)
+    relative_components = relative_path.split('/')
+    count = 0
+    while (count < len(build_components) and count < len(relative_components)
+           and build_components[-1 - count] == relative_components[-1 - count]):
+        count += 1
+    return count
+
+
+def run_command_parser():
+    my_parser = argparse.ArgumentParser(description='Build or refresh the file name index of a repository')
+    my_parser.add_argument('-r', '--repo-root', help='The root folder of the repository', required=True)
+    my_parser.add_argument('-f', '--file-name', help='Find the file by name')
+    my_parser.add_argument('-b', '--build-path', help='The build path in debug info, to choose the best one of the same name files')
+    my_parser.add_argument('-w', '--workers', type=int, default=8, help='The number of folders walked in parallel')
+    args = my_parser.parse_args()
+    return args
+
+
+def main():
+    args = run_command_parser()
+    index = SourceFileIndex(args.repo_root, max_workers=args.workers)
+    start_time = time.perf_counter()
+    changed_count = index.update()
+    print(f'{len(index.dir_dict)} folders, {changed_count} changed, {(time.perf_counter() - start_time) * 1000:.1f} ms, index: {index.index_file_path}')
+
+    if args.file_name:
+        start_time = time.perf_counter()
+        file_path = index.find(args.file_name, args.build_path)
+        print(f'{file_path} ({(time.perf_counter() - start_time) * 1000000:.1f} us)')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
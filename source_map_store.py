@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# The store of the target.source-map entries made by lldb_command_show_source_code.py
+#
+# The entries are kept in a SQLite database, one row per build prefix:
+# - the build prefix is the primary key, adding an entry replaces the old one
+# - the local prefix is indexed, so the entries of a removed folder are deleted by a range query
+# - every change is one transaction, and WAL mode lets several lldb sessions share the file
+# - the local prefixes are checked for existence once per session, the missing ones are deleted
+#
+# The old /tmp/show_source_code/source_map.txt is imported when the database is created.
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SOURCE_MAP_DB_FILE_PATH = '/tmp/show_source_code/source_map.db'
+LEGACY_SOURCE_MAP_FILE_PATH = '/tmp/show_source_code/source_map.txt'
+
+
+class SourceMapStore(object):
+    def __init__(self, db_file_path=SOURCE_MAP_DB_FILE_PATH, legacy_file_path=LEGACY_SOURCE_MAP_FILE_PATH):
+        self.db_file_path = db_file_path
+        # Note: the local prefixes already checked by os.path.exists in this session
+        self._checked_local_prefixes = set()
+        self._lock = threading.Lock()
+
+        is_new = not os.path.isfile(db_file_path)
+        os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS source_map ('
+                               'build_prefix TEXT PRIMARY KEY, '
+                               'local_prefix TEXT NOT NULL, '
+                               'updated_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS source_map_local_prefix ON source_map (local_prefix)')
+
+        if is_new and legacy_file_path and os.path.isfile(legacy_file_path):
+            self.import_text_file(legacy_file_path)
+
+    def get_map_dict(self):
+        """Return an ordered dictionary of build prefix -> local prefix, the oldest first"""
+        with self._connect() as connection:
+            rows = connection.execute('SELECT build_prefix, local_prefix FROM source_map ORDER BY updated_at, rowid').fetchall()
+
+        return OrderedDict(rows)
+
+    def get_valid_map_dict(self):
+        """Same as get_map_dict, but delete the entries whose local prefix doesn't exist"""
+        map_dict = self.get_map_dict()
+        missing_local_prefixes = set()
+        with self._lock:
+            for local_prefix in set(map_dict.values()) - self._checked_local_prefixes:
+                if os.path.exists(local_prefix):
+                    self._checked_local_prefixes.add(local_prefix)
+                else:
+                    missing_local_prefixes.add(local_prefix)
+
+        if len(missing_local_prefixes) == 0:
+            return map_dict
+
+        with self._connect() as connection:
+            connection.executemany('DELETE FROM source_map WHERE local_prefix = ?', [(x,) for x in missing_local_prefixes])
+
+        return OrderedDict((k, v) for k, v in map_dict.items() if v not in missing_local_prefixes)
+
+    def add(self, map_dict):
+        """Add or replace the entries of the build prefix -> local prefix dictionary"""
+        if len(map_dict) == 0:
+            return
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO source_map (build_prefix, local_prefix, updated_at) VALUES (?, ?, ?)',
+                                   [(k, v, now) for k, v in map_dict.items()])
+        with self._lock:
+            self._checked_local_prefixes.update(x for x in map_dict.values() if os.path.exists(x))
+
+    def remove_local_dir(self, dir_path):
+        """Delete the entries whose local prefix is dir_path or under it. Return the list of the deleted build prefixes"""
+        dir_path = dir_path.rstrip('/')
+        # Note: '0' is the next character of '/', so the range matches `dir_path/...` by the index
+        condition = 'local_prefix = ? OR (local_prefix >= ? AND local_prefix < ?)'
+        condition_args = (dir_path, dir_path + '/', dir_path + '0')
+        with self._connect() as connection:
+            build_prefix_list = [x[0] for x in connection.execute(f'SELECT build_prefix FROM source_map WHERE {condition}', condition_args)]
+            connection.execute(f'DELETE FROM source_map WHERE {condition}', condition_args)
+        with self._lock:
+            self._checked_local_prefixes = set(x for x in self._checked_local_prefixes if x != dir_path and not x.startswith(dir_path + '/'))
+
+        return build_prefix_list
+
+    def import_text_file(self, file_path):
+        """Import the lines of `<build prefix> <local prefix>` from the old source_map.txt"""
+        map_dict = OrderedDict()
+        with open(file_path, 'r') as f:
+            for line in f:
+                components = line.strip(' \n').split(' ')
+                if len(components) != 2:
+                    continue
+                map_dict[components[0]] = components[1]
+        self.add(map_dict)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Note: a connection per call, the store is used by the lldb command and the background jobs
+        connection = sqlite3.connect(self.db_file_path, timeout=10)
+        try:
+            # Note: `with connection` commits or rolls back the transaction, but doesn't close it
+            with connection:
+                yield connection
+        finally:
+            connection.close()
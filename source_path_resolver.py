@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# Translate the build paths in debug info into the local paths
+#
+# The resolver keeps a trie keyed on the path components, so every lookup walks the
+# components of the path once:
+# - build prefix -> local prefix, e.g. the target.source-map entries
+# - pod name sentinels, the component before the pod name, e.g. /.../<sentinel>/PodName/...
+#
+# Usage:
+# resolver = SourcePathResolver(['sentinel'])
+# resolver.add_map_dict({'/Users/username/sentinel/PodName': '/tmp/show_source_code/PodName/1.0.0/PodName'})
+# resolver.resolve('/Users/username/sentinel/PodName/Classes/a.m')
+# => /tmp/show_source_code/PodName/1.0.0/PodName/Classes/a.m
+# resolver.get_pod_info('/Users/username/sentinel/PodName/Classes/a.m')
+# => {'pod_name': 'PodName', 'pod_build_prefix': '/Users/username/sentinel/PodName'}
+
+import threading
+
+
+class PathTrie(object):
+    """A trie keyed on the path components, the value of a node is for the path prefix ending at it"""
+    __slots__ = ('children', 'value', 'has_value')
+
+    def __init__(self):
+        self.children = {}
+        self.value = None
+        self.has_value = False
+
+    def insert(self, path, value):
+        node = self
+        for component in tool_split_path(path):
+            child = node.children.get(component)
+            if child is None:
+                child = node.children[component] = PathTrie()
+            node = child
+        node.value = value
+        node.has_value = True
+
+    def remove(self, path):
+        node = self
+        for component in tool_split_path(path):
+            node = node.children.get(component)
+            if node is None:
+                return
+        node.value = None
+        node.has_value = False
+
+    def find_longest_prefix(self, components):
+        """Return (the component count of the longest prefix with a value, the value), or (0, None)"""
+        node = self
+        matched = (0, None)
+        for index, component in enumerate(components):
+            node = node.children.get(component)
+            if node is None:
+                break
+            if node.has_value:
+                matched = (index + 1, node.value)
+        return matched
+
+
+class SourcePathResolver(object):
+    def __init__(self, sentinel_list=None):
+        # Note: the earlier sentinel wins if a path has several, same as the order in the .env file
+        self.sentinel_priority_dict = {}
+        for index, sentinel in enumerate(sentinel_list or []):
+            self.sentinel_priority_dict.setdefault(sentinel.strip(), index)
+        self.build_prefix_trie = PathTrie()
+        # Note: the pod build prefixes found by the sentinels, the value is the pod name
+        self.pod_prefix_trie = PathTrie()
+        self._lock = threading.Lock()
+
+    def add_map_dict(self, map_dict):
+        with self._lock:
+            for build_prefix, local_prefix in map_dict.items():
+                self.build_prefix_trie.insert(build_prefix, local_prefix)
+
+    def remove_build_prefix(self, build_prefix):
+        with self._lock:
+            self.build_prefix_trie.remove(build_prefix)
+
+    def get_pod_info(self, build_path):
+        """Return a dictionary with keys: pod_name、pod_build_prefix, or None if no sentinel found"""
+        components = tool_split_path(build_path)
+        with self._lock:
+            count, pod_name = self.pod_prefix_trie.find_longest_prefix(components)
+        if count == 0:
+            index_before_pod = self.find_sentinel_index(components)
+            if index_before_pod is None or index_before_pod + 1 >= len(components):
+                return None
+            count = index_before_pod + 2
+            pod_name = components[index_before_pod + 1]
+            with self._lock:
+                self.pod_prefix_trie.insert(tool_join_path(components[:count]), pod_name)
+
+        return {
+            'pod_name': pod_name,
+            'pod_build_prefix': tool_join_path(components[:count]),
+        }
+
+    def find_sentinel_index(self, components):
+        """Return the index of the sentinel component, or None"""
+        matched_index = None
+        matched_priority = None
+        for index, component in enumerate(components):
+            priority = self.sentinel_priority_dict.get(component)
+            if priority is not None and (matched_priority is None or priority < matched_priority):
+                matched_index = index
+                matched_priority = priority
+        return matched_index
+
+    def resolve(self, build_path):
+        """Return the local path of the build path, or None if unknown"""
+        components = tool_split_path(build_path)
+        with self._lock:
+            count, local_prefix = self.build_prefix_trie.find_longest_prefix(components)
+        if count == 0:
+            return None
+
+        return tool_join_path([local_prefix.rstrip('/')] + components[count:])
+
+    def resolve_batch(self, build_path_list):
+        """Return a dictionary of build path -> local path or None"""
+        return {x: self.resolve(x) for x in dict.fromkeys(build_path_list)}
+
+
+def split_common_suffix(build_path, local_path):
+    """Split the paths by their common trailing components. Return (common suffix, build prefix, local prefix)
+
+    e.g. /build/a/Classes/b.m and /repo/Classes/b.m -> (Classes/b.m, /build/a, /repo)
+    """
+    build_components = tool_split_path(build_path)
+    local_components = tool_split_path(local_path)
+    count = 0
+    while (count < len(build_components) - 1 and count < len(local_components) - 1
+           and build_components[-1 - count] == local_components[-1 - count]):
+        count += 1
+
+    if count == 0:
+        return '', build_path, local_path
+
+    return ('/'.join(build_components[-count:]),
+            tool_join_path(build_components[:-count]),
+            tool_join_path(local_components[:-count]))
+
+
+def tool_split_path(path):
+    """Split the path into components, the absolute path starts with an empty component"""
+    components = path.split('/')
+    # Note: keep the leading '' of the absolute path, drop the empty components in the middle and the end
+    return components[:1] + [x for x in components[1:] if x]
+
+
+def tool_join_path(components):
+    if components == ['']:
+        return '/'
+    return '/'.join(components)